@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Adaptive encoding (ADAPTIVE_QUALITY in generator_slam.py): polls the
+srtserversink stats of a camera and moves it along a ladder of
+(jpegenc quality, scale) levels.
+
+The controller steps down as soon as the link shows congestion building up,
+before SRT has to drop packets: RTT above the lowest RTT seen times
+rtt_factor, retransmissions above retrans_high of the packets sent, send
+rate above util_high of SRT's bandwidth estimate, or any dropped packet. It
+steps back up one level after `hold` calm polls (low utilisation, RTT near
+its base). Every change is logged with the stats that triggered it.
+"""
+from fanout import srt_sink_stats
+
+LADDER = [(85, 1.0), (70, 1.0), (55, 1.0), (55, 0.75), (45, 0.5)]
+
+
+class QualityController:
+    """apply(quality, scale) sets the encoder; sinks: the camera's srtserversink(s), worst one wins."""
+
+    def __init__(self, name, sinks, apply, ladder=LADDER, rtt_factor=1.5,
+                 retrans_high=0.02, util_high=0.8, util_low=0.5, hold=6):
+        self.name = name
+        self.sinks = sinks
+        self.apply = apply
+        self.ladder = ladder
+        self.rtt_factor = rtt_factor
+        self.retrans_high = retrans_high
+        self.util_high = util_high
+        self.util_low = util_low
+        self.hold = hold
+        self.level = 0
+        self.base_rtt = None
+        self.calm = 0
+        self.changes = 0
+        self._prev = {}
+        apply(*ladder[0])
+
+    def _sample(self):
+        """Worst (rtt_ms, retrans fraction, dropped packets, utilisation) over the connected sinks."""
+        worst = None
+        for i, sink in enumerate(self.sinks):
+            s = srt_sink_stats(sink)
+            if 'packets-sent' not in s:
+                continue
+            sent, retrans = s['packets-sent'], s.get('packets-retransmitted', 0)
+            dropped = s.get('packets-sent-dropped', 0)
+            p_sent, p_retrans, p_dropped = self._prev.get(i, (sent, retrans, dropped))
+            self._prev[i] = (sent, retrans, dropped)
+            d_sent = max(sent - p_sent, 0)
+            bandwidth = s.get('bandwidth-mbps', 0.0)
+            sample = (s.get('rtt-ms', 0.0),
+                      (retrans - p_retrans) / d_sent if d_sent else 0.0,
+                      max(dropped - p_dropped, 0),
+                      s.get('send-rate-mbps', 0.0) / bandwidth if bandwidth > 0 else 0.0)
+            worst = sample if worst is None else tuple(max(a, b) for a, b in zip(worst, sample))
+        return worst
+
+    def step(self):
+        """One poll; returns True so it can be used as a GLib timeout callback."""
+        sample = self._sample()
+        if sample is None:
+            return True
+        rtt, retrans, dropped, util = sample
+        if rtt > 0:
+            self.base_rtt = rtt if self.base_rtt is None else min(self.base_rtt, rtt)
+        reasons = []
+        if dropped:
+            reasons.append(f"dropped={dropped}")
+        if retrans > self.retrans_high:
+            reasons.append(f"retrans={100 * retrans:.1f}%")
+        if self.base_rtt and rtt > self.base_rtt * self.rtt_factor:
+            reasons.append(f"rtt={rtt:.1f}ms>{self.rtt_factor}x{self.base_rtt:.1f}ms")
+        if util > self.util_high:
+            reasons.append(f"util={100 * util:.0f}%")
+
+        if reasons:
+            self.calm = 0
+            if self.level < len(self.ladder) - 1:
+                self._set(self.level + 1, "congestion " + " ".join(reasons), sample)
+        elif util < self.util_low and (not self.base_rtt or rtt <= self.base_rtt * 1.2):
+            self.calm += 1
+            if self.calm >= self.hold and self.level > 0:
+                self.calm = 0
+                self._set(self.level - 1, "link calm", sample)
+        else:
+            self.calm = 0
+        return True
+
+    def _set(self, level, why, sample):
+        rtt, retrans, dropped, util = sample
+        quality, scale = self.ladder[level]
+        print(f"[ADAPT] {self.name}: level {self.level}->{level} quality={quality} scale={scale} ({why}; "
+              f"rtt={rtt:.1f}ms base={self.base_rtt or 0:.1f}ms retrans={100 * retrans:.1f}% "
+              f"dropped={dropped} util={100 * util:.0f}%)")
+        self.level = level
+        self.changes += 1
+        self.apply(quality, scale)
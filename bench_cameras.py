@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Generator throughput with 4, 8, 16 cameras in one process.
+
+Every camera replays the same image dir (looping) into fakesinks with
+sync=false, so the numbers are the unpaced capacity of the generator:
+frames/s in total and per camera, and CPU use of the process. --pacing
+compares the need-data path with the buffer-list feeder threads.
+
+    python bench_cameras.py --image-dir /path/imgs_left_numbered --cameras 4 8 16 --duration 10
+    python bench_cameras.py --cameras 8 --pacing appsrc feeder
+"""
+import argparse
+import time
+
+import generator_slam as gen
+from gi.repository import Gst, GLib
+
+
+def run(n, image_dir, duration, pacing="appsrc"):
+    cameras = [{'name': f"cam{i}", 'image_dir': image_dir} for i in range(n)]
+    gen.LOOPS = 0
+    gen.PACING = pacing
+    desc = gen.build_pipeline_desc(cameras,
+                                   video_sink=lambda cam: "fakesink sync=false",
+                                   klv_sink="fakesink sync=false",
+                                   ts_sink="fakesink sync=false",
+                                   preview_sink=lambda cam: "fakesink sync=false")
+    pipeline = Gst.parse_launch(desc)
+    gen.setup_cameras(cameras)
+    for cam in cameras:
+        gen.connect_camera(pipeline, cam)
+    if gen.stereo_packed():
+        gen.connect_stereo(pipeline, cameras)
+
+    loop = GLib.MainLoop()
+    bus = pipeline.get_bus()
+    bus.add_signal_watch()
+    bus.connect('message', lambda b, m: gen.on_message(b, m, loop))
+    GLib.timeout_add(int(duration * 1000), loop.quit)
+
+    pipeline.set_state(Gst.State.PLAYING)
+    if pacing == "feeder":
+        gen.start_feeders()
+    t0, c0 = time.monotonic(), time.process_time()
+    loop.run()
+    elapsed, cpu = time.monotonic() - t0, time.process_time() - c0
+    frames = sum(gen.video_indexes.values()) - n
+    pipeline.set_state(Gst.State.NULL)
+    gen.teardown()
+
+    fps = frames / elapsed
+    print(f"[BENCH] {pacing} cameras={n:2d} frames={frames} fps_total={fps:.1f} fps_per_camera={fps / n:.1f} "
+          f"cpu={100 * cpu / elapsed:.0f}% cpu_per_frame={1e3 * cpu / max(frames, 1):.3f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--image-dir', default=gen.IMAGE_DIR_LEFT)
+    parser.add_argument('--cameras', type=int, nargs='+', default=[4, 8, 16])
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--pacing', nargs='+', choices=['appsrc', 'feeder'], default=['appsrc'])
+    args = parser.parse_args()
+    for n in args.cameras:
+        for pacing in args.pacing:
+            run(n, args.image_dir, args.duration, pacing)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+MJPEG vs H.264 (CODEC in generator_slam.py) over SRT on localhost.
+
+Sender and receiver run in separate processes so their CPU is measured
+separately: the sender paces the dataset JPEGs at --fps (pacer.Pacer) and
+encodes/payloads them, the receiver depayloads and decodes them. Frames are
+matched by the RTP frame id extension, so the latency is from the push into
+the sender appsrc to the decoded frame at the receiver appsink (it includes
+the SRT latency window, --srt-latency).
+
+    python bench_codec.py --image-dir /path/imgs_left_numbered --frames 300 --fps 30
+"""
+import argparse
+import multiprocessing as mp
+import resource
+import threading
+import time
+
+from manifest import DatasetManifest
+
+DEPAY_DECODE = {
+    'jpeg': "application/x-rtp,media=video,encoding-name=JPEG,payload=26 ! rtpjpegdepay name=depay ! jpegdec",
+    'h264': "application/x-rtp,media=video,encoding-name=H264,payload=96 ! rtph264depay name=depay ! avdec_h264",
+}
+
+
+def cpu_time():
+    ru = resource.getrusage(resource.RUSAGE_SELF)
+    return ru.ru_utime + ru.ru_stime
+
+
+def sender(codec, args, results):
+    import generator_slam as gen
+    from gi.repository import Gst
+    from pacer import Pacer
+    from rtp_frame_id import FrameIdRelay
+
+    entries = DatasetManifest.scan(args.image_dir, args.pattern).entries[:args.frames]
+    frames = []
+    for e in entries:
+        with open(e.path, 'rb') as f:
+            frames.append(f.read())
+    duration = Gst.SECOND // args.fps
+    encode = "jpegparse" if codec == "jpeg" else "jpegparse ! jpegdec ! videoconvert ! video/x-raw,format=I420"
+    pipeline = Gst.parse_launch(
+        f"appsrc name=src caps=\"image/jpeg,framerate={args.fps}/1\" is-live=true format=time ! "
+        f"{encode} ! {gen.rtp_payloader('enc', codec)} ! appsink name=pay emit-signals=true sync=false "
+        f"appsrc name=rtp is-live=true format=time ! "
+        f"srtserversink uri=srt://:{args.port}?mode=listener latency={args.srt_latency} wait-for-connection=true sync=false")
+    src = pipeline.get_by_name('src')
+    FrameIdRelay(pipeline.get_by_name('pay'), pipeline.get_by_name('rtp'),
+                 lambda pts: (pts // duration + 1, 0))
+
+    sent = {}
+    state = {'n': 0}
+
+    def emit():
+        n = state['n']
+        if n >= args.frames:
+            return False
+        data = frames[n % len(frames)]
+        buf = Gst.Buffer.new_wrapped(data)
+        buf.pts = n * duration
+        buf.duration = duration
+        sent[n + 1] = time.monotonic()
+        src.emit('push-buffer', buf)
+        state['n'] += 1
+        return state['n'] < args.frames
+
+    pipeline.set_state(Gst.State.PLAYING)
+    # srtserversink blocks the streaming thread until the receiver connects
+    time.sleep(args.warmup)
+    done = threading.Event()
+    pacer = Pacer(report_interval=0, on_done=done.set)
+    pacer.add_stream(codec, emit, lambda: state['n'] * duration)
+    c0 = cpu_time()
+    pacer.start()
+    done.wait()
+    time.sleep(args.drain)
+    cpu = cpu_time() - c0
+    pipeline.set_state(Gst.State.NULL)
+    results.put(('send', cpu, sent))
+
+
+def receiver(codec, args, results):
+    import gi
+    gi.require_version('Gst', '1.0')
+    from gi.repository import Gst
+    from rtp_frame_id import FrameIdProbe
+    Gst.init(None)
+
+    pipeline = Gst.parse_launch(
+        f"srtsrc name=srt uri=srt://127.0.0.1:{args.port}?mode=caller latency={args.srt_latency} ! queue ! "
+        f"{DEPAY_DECODE[codec]} ! appsink name=out emit-signals=true sync=false")
+    probe = FrameIdProbe(pipeline.get_by_name('depay'))
+    received = {}
+    state = {'bytes': 0, 'first': None, 'last': None}
+
+    def on_bytes(pad, info):
+        now = time.monotonic()
+        state['bytes'] += info.get_buffer().get_size()
+        state['first'] = state['first'] or now
+        state['last'] = now
+        return Gst.PadProbeReturn.OK
+
+    def on_sample(sink):
+        buf = sink.emit('pull-sample').get_buffer()
+        ids = probe.lookup(buf.pts)
+        if ids is not None:
+            received[ids[0]] = time.monotonic()
+        return Gst.FlowReturn.OK
+
+    pipeline.get_by_name('srt').get_static_pad('src').add_probe(Gst.PadProbeType.BUFFER, on_bytes)
+    pipeline.get_by_name('out').connect('new-sample', on_sample)
+    pipeline.set_state(Gst.State.PLAYING)
+    c0 = cpu_time()
+    deadline = time.monotonic() + args.warmup + args.frames / args.fps + args.drain
+    while time.monotonic() < deadline and len(received) < args.frames:
+        time.sleep(0.05)
+    cpu = cpu_time() - c0
+    pipeline.set_state(Gst.State.NULL)
+    span = (state['last'] - state['first']) if state['first'] else 0.0
+    results.put(('recv', cpu, received, state['bytes'], span))
+
+
+def run(codec, args):
+    ctx = mp.get_context('spawn')
+    results = ctx.Queue()
+    procs = [ctx.Process(target=receiver, args=(codec, args, results)),
+             ctx.Process(target=sender, args=(codec, args, results))]
+    for p in procs:
+        p.start()
+    out = {}
+    for _ in procs:
+        msg = results.get()
+        out[msg[0]] = msg[1:]
+    for p in procs:
+        p.join()
+
+    from pacer import percentile
+    send_cpu, sent = out['send']
+    recv_cpu, received, nbytes, span = out['recv']
+    latencies = sorted(received[i] - sent[i] for i in received if i in sent)
+    n = len(latencies)
+    kbps = 8 * nbytes / span / 1e3 if span > 0 else 0.0
+    print(f"[BENCH] codec={codec} frames={len(sent)} received={n} bitrate={kbps:.0f}kbit/s "
+          f"enc_cpu={1e3 * send_cpu / max(len(sent), 1):.2f}ms/frame dec_cpu={1e3 * recv_cpu / max(n, 1):.2f}ms/frame "
+          f"latency_p50={1e3 * percentile(latencies, 0.5):.1f}ms latency_p99={1e3 * percentile(latencies, 0.99):.1f}ms")
+
+
+def main():
+    import generator_slam as gen
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--image-dir', default=gen.IMAGE_DIR_LEFT)
+    parser.add_argument('--pattern', default=gen.PATTERN)
+    parser.add_argument('--codecs', nargs='+', default=['jpeg', 'h264'], choices=sorted(DEPAY_DECODE))
+    parser.add_argument('--frames', type=int, default=300)
+    parser.add_argument('--fps', type=int, default=30)
+    parser.add_argument('--port', type=int, default=6040)
+    parser.add_argument('--srt-latency', type=int, default=120, help="ms, both ends")
+    parser.add_argument('--warmup', type=float, default=2.0, help="s before the first frame")
+    parser.add_argument('--drain', type=float, default=2.0, help="s after the last frame")
+    args = parser.parse_args()
+    for codec in args.codecs:
+        run(codec, args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Per-frame emission overhead: appsrc need-data + push-buffer (PACING =
+"appsrc") against a feeder thread pushing Gst.BufferLists (PACING =
+"feeder") with several batch sizes.
+
+Frames are --size bytes held in memory and every appsrc feeds a fakesink
+(sync=false), so what is left is the cost of getting buffers into the
+pipeline: signal emissions through PyGObject, buffer wrapping, appsrc
+queueing. Printed per run: frames/s over all cameras, process CPU per frame
+and the time spent in Python emission code per frame.
+
+    python bench_feed.py --cameras 8 --frames 5000 --batch 1 4 8 32
+"""
+import argparse
+import threading
+import time
+
+import gi
+gi.require_version('Gst', '1.0')
+from gi.repository import Gst, GLib
+
+FPS = 30
+
+
+def build(cameras, max_bytes):
+    desc = "".join(
+        f"appsrc name=src{i} caps=\"image/jpeg,framerate={FPS}/1\" format=time block=true max-bytes={max_bytes} ! "
+        "fakesink sync=false "
+        for i in range(cameras))
+    pipeline = Gst.parse_launch(desc)
+    return pipeline, [pipeline.get_by_name(f"src{i}") for i in range(cameras)]
+
+
+def make_buffer(payload, n):
+    buf = Gst.Buffer.new_wrapped(payload)
+    buf.pts = n * Gst.SECOND // FPS
+    buf.duration = Gst.SECOND // FPS
+    return buf
+
+
+def run(mode, batch, args):
+    payload = bytes(args.size)
+    pipeline, srcs = build(args.cameras, args.max_bytes)
+    busy = [0.0] * len(srcs)
+
+    if mode == "need-data":
+        counts = [0] * len(srcs)
+
+        def on_need_data(src, length, i):
+            t = time.perf_counter()
+            if counts[i] >= args.frames:
+                src.emit('end-of-stream')
+            else:
+                src.emit('push-buffer', make_buffer(payload, counts[i]))
+                counts[i] += 1
+            busy[i] += time.perf_counter() - t
+        for i, src in enumerate(srcs):
+            src.connect('need-data', on_need_data, i)
+        threads = []
+    else:
+        def feed(src, i):
+            n = 0
+            while n < args.frames:
+                t = time.perf_counter()
+                blist = Gst.BufferList.new()
+                for _ in range(min(batch, args.frames - n)):
+                    blist.insert(-1, make_buffer(payload, n))
+                    n += 1
+                ret = src.emit('push-buffer-list', blist)
+                busy[i] += time.perf_counter() - t
+                if ret != Gst.FlowReturn.OK:
+                    return
+            src.emit('end-of-stream')
+        threads = [threading.Thread(target=feed, args=(src, i), daemon=True) for i, src in enumerate(srcs)]
+
+    loop = GLib.MainLoop()
+    bus = pipeline.get_bus()
+    bus.add_signal_watch()
+    bus.connect('message::eos', lambda b, m: loop.quit())
+    bus.connect('message::error', lambda b, m: (print(f"[ERROR] {m.parse_error()[0].message}"), loop.quit()))
+
+    t0, c0 = time.monotonic(), time.process_time()
+    pipeline.set_state(Gst.State.PLAYING)
+    for t in threads:
+        t.start()
+    loop.run()
+    elapsed, cpu = time.monotonic() - t0, time.process_time() - c0
+    pipeline.set_state(Gst.State.NULL)
+
+    frames = args.frames * args.cameras
+    label = mode if mode == "need-data" else f"feeder batch={batch}"
+    print(f"[BENCH] {label:18s} cameras={args.cameras} fps_total={frames / elapsed:.0f} "
+          f"cpu_per_frame={1e6 * cpu / frames:.1f}us python_per_frame={1e6 * sum(busy) / frames:.1f}us")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--cameras', type=int, default=8)
+    parser.add_argument('--frames', type=int, default=5000, help="frames per camera")
+    parser.add_argument('--size', type=int, default=100_000, help="frame size in bytes")
+    parser.add_argument('--batch', type=int, nargs='+', default=[1, 4, 8, 32])
+    parser.add_argument('--max-bytes', type=int, default=16 * 1024 * 1024)
+    args = parser.parse_args()
+    Gst.init(None)
+    run("need-data", 1, args)
+    for batch in args.batch:
+        run("feeder", batch, args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+"""
+Process-per-camera generator (RTP transport): a supervisor spawns one
+worker process per camera of generator_slam.CAMERAS. Each worker runs that
+camera's video branch, so need-data callbacks, passthrough checks and
+jpegenc scale over cores instead of sharing one GIL. The supervisor keeps
+the KLV of all cameras in one TS (cheap, and clients are unchanged).
+
+Startup is two-phase: every worker loads its manifest and builds its
+pipeline, then reports ready. The supervisor then picks one base time on
+the system clock (CLOCK_MONOTONIC, the same in every process) and sends it
+to all of them. PTS 0 leaves everywhere at that instant, and a pacer
+started in a worker uses the same origin. Workers report frames/s and CPU
+on one event queue; the supervisor prints them and forwards stdin
+commands ("seek <index>", "stop") on per-worker command queues; a seek
+carries the output frame every process switches at.
+
+    python camera_workers.py
+    python camera_workers.py --bench 8 --image-dir /path/imgs_left_numbered --duration 10
+
+--bench N replays one image dir as N looping cameras into fakesinks
+(sync=false) and prints the aggregate throughput, to compare with the
+single-process numbers of bench_cameras.py.
+"""
+import argparse
+import multiprocessing as mp
+import queue
+import sys
+import threading
+import time
+
+import generator_slam as gen
+from gi.repository import Gst, GLib
+from net_clock import use
+
+READY_TIMEOUT_S = 60
+START_MARGIN_S = 0.5
+# A seek switches every process at one output frame, this far past the
+# current one so the command reaches all workers before they get there
+SEEK_MARGIN_S = 0.5
+
+
+def follow_commands(commands, loop):
+    while True:
+        cmd = commands.get()
+        if cmd[0] == 'stop':
+            GLib.idle_add(loop.quit)
+            return
+        if cmd[0] == 'seek':
+            GLib.idle_add(gen.seek, cmd[1], cmd[2])
+
+
+def worker(cam, events, commands, sink=None, overrides=None):
+    """One camera's video branch on the supervisor's base time."""
+    for key, value in (overrides or {}).items():
+        setattr(gen, key, value)
+    name = cam['name']
+    video_sink = (lambda c: sink) if sink else None
+    preview_sink = (lambda c: sink) if sink else None
+    gen.setup_cameras([cam])
+    pipeline = Gst.parse_launch(gen.build_pipeline_desc([cam], video_sink=video_sink,
+                                                        preview_sink=preview_sink, klv=False))
+    gen.connect_camera(pipeline, cam, klv=False)
+    if gen.FANOUT > 1:
+        gen.connect_fanout(pipeline, cam)
+    if gen.with_adaptive():
+        gen.connect_adaptive(pipeline, cam)
+        GLib.timeout_add(gen.ADAPT_INTERVAL_MS, gen.step_controllers)
+
+    loop = GLib.MainLoop()
+    bus = pipeline.get_bus()
+    bus.add_signal_watch()
+
+    def on_message(bus, message):
+        if message.type == Gst.MessageType.ERROR:
+            events.put(('error', name, message.parse_error()[0].message))
+            loop.quit()
+        elif message.type == Gst.MessageType.EOS:
+            events.put(('eos', name, None))
+            loop.quit()
+    bus.connect('message', on_message)
+
+    last = {'t': time.monotonic(), 'frames': 0, 'cpu': time.process_time()}
+
+    def report():
+        now, cpu, frames = time.monotonic(), time.process_time(), gen.video_indexes[name] - 1
+        dt = max(now - last['t'], 1e-9)
+        events.put(('stats', name, {'frames': frames, 'fps': (frames - last['frames']) / dt,
+                                    'cpu': (cpu - last['cpu']) / dt}))
+        last.update(t=now, frames=frames, cpu=cpu)
+        return True
+
+    events.put(('ready', name, None))
+    cmd = commands.get()
+    if cmd[0] != 'start':
+        return
+    base_time = cmd[1]
+    use((pipeline,), Gst.SystemClock.obtain(), base_time)
+    GLib.timeout_add_seconds(gen.STATS_INTERVAL_S, report)
+    threading.Thread(target=follow_commands, args=(commands, loop), daemon=True).start()
+    pipeline.set_state(Gst.State.PLAYING)
+    gen.run_clock['start'] = base_time / Gst.SECOND
+    if gen.scheduled():
+        gen.pacer.start(at=base_time / Gst.SECOND)
+    elif gen.PACING == "feeder":
+        gen.start_feeders()
+    t0, c0 = time.monotonic(), time.process_time()
+    try:
+        loop.run()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        elapsed, cpu = time.monotonic() - t0, time.process_time() - c0
+        events.put(('done', name, {'frames': gen.video_indexes[name] - 1, 'elapsed': elapsed, 'cpu_s': cpu}))
+        pipeline.set_state(Gst.State.NULL)
+        gen.teardown()
+
+
+class Supervisor:
+    def __init__(self, cameras, sink=None, klv_sink=None, overrides=None):
+        if gen.TRANSPORT != "rtp" or gen.STEREO_PACK or gen.LIVE_INGEST:
+            raise RuntimeError("camera workers need TRANSPORT = \"rtp\", no STEREO_PACK and no LIVE_INGEST")
+        for key, value in (overrides or {}).items():
+            setattr(gen, key, value)
+        self.cameras = cameras
+        self.klv_sink = klv_sink
+        self.ctx = mp.get_context('spawn')
+        self.events = self.ctx.Queue()
+        self.workers = {}
+        self.done = {}
+        self.frames = {}
+        self.base_time = None
+        for cam in cameras:
+            commands = self.ctx.Queue()
+            proc = self.ctx.Process(target=worker, args=(cam, self.events, commands, sink, overrides),
+                                    name=f"cam_{cam['name']}", daemon=True)
+            proc.start()
+            self.workers[cam['name']] = (proc, commands)
+
+    def broadcast(self, *cmd):
+        for _, commands in self.workers.values():
+            commands.put(cmd)
+
+    def _wait_ready(self):
+        waiting = set(self.workers)
+        deadline = time.monotonic() + READY_TIMEOUT_S
+        while waiting:
+            try:
+                kind, name, value = self.events.get(timeout=max(deadline - time.monotonic(), 0.01))
+            except queue.Empty:
+                raise RuntimeError(f"workers not ready after {READY_TIMEOUT_S}s: {', '.join(sorted(waiting))}")
+            if kind == 'error':
+                raise RuntimeError(f"worker {name}: {value}")
+            if kind == 'ready':
+                waiting.discard(name)
+
+    def _drain(self, loop):
+        while True:
+            try:
+                kind, name, value = self.events.get_nowait()
+            except queue.Empty:
+                return True
+            if kind == 'stats':
+                self.frames[name] = value['frames']
+                print(f"[WORKER] {name}: frames={value['frames']} fps={value['fps']:.1f} cpu={100 * value['cpu']:.0f}%")
+            elif kind == 'error':
+                print(f"[ERROR] worker {name}: {value}")
+                loop.quit()
+            elif kind == 'eos':
+                print(f"[WORKER] {name}: end of stream")
+            elif kind == 'done':
+                self.done[name] = value
+
+    def switch_frame(self):
+        """Output frame (1-based) a seek issued now takes effect at, the same in every process."""
+        running = Gst.SystemClock.obtain().get_time() - self.base_time
+        # frames already pushed: the clock for paced sinks, the last stats when running ahead of it
+        frame = max(running // gen.frame_duration + 1, max(self.frames.values(), default=0),
+                    max(gen.video_indexes.values(), default=1), max(gen.meta_indexes.values(), default=1))
+        return frame + int(SEEK_MARGIN_S * Gst.SECOND) // gen.frame_duration + 1
+
+    def _read_commands(self):
+        for line in sys.stdin:
+            cmd = line.split()
+            if len(cmd) == 2 and cmd[0] == 'seek' and cmd[1].isdigit():
+                at = self.switch_frame()
+                self.broadcast('seek', int(cmd[1]), at)
+                GLib.idle_add(gen.seek, int(cmd[1]), at)
+            elif cmd == ['stop']:
+                GLib.idle_add(self.loop.quit)
+            elif cmd:
+                print(f"[CMD] unknown command: {line.strip()} (expected: seek <index> | stop)")
+
+    def run(self, duration=None):
+        cameras = self.cameras
+        # KLV of all cameras stays here, on the same base time as the video
+        gen.setup_cameras(cameras, video=False)
+        pipeline = Gst.parse_launch(gen.build_pipeline_desc(cameras, klv_sink=self.klv_sink, video=False))
+        for cam in cameras:
+            gen.connect_camera(pipeline, cam, video=False)
+        self._wait_ready()
+
+        self.base_time = base_time = Gst.SystemClock.obtain().get_time() + int(START_MARGIN_S * Gst.SECOND)
+        if gen.NET_CLOCK_PORT:
+            gen.start_net_clock(pipeline, base_time)
+        else:
+            use((pipeline,), Gst.SystemClock.obtain(), base_time)
+        self.broadcast('start', base_time)
+
+        self.loop = loop = GLib.MainLoop()
+        bus = pipeline.get_bus()
+        bus.add_signal_watch()
+        bus.connect('message', lambda b, m: gen.on_message(b, m, loop))
+        GLib.timeout_add(100, self._drain, loop)
+        if duration:
+            GLib.timeout_add(int(duration * 1000), loop.quit)
+        threading.Thread(target=self._read_commands, daemon=True).start()
+
+        pipeline.set_state(Gst.State.PLAYING)
+        if gen.scheduled():
+            gen.pacer.start(at=base_time / Gst.SECOND)
+        elif gen.PACING == "feeder":
+            gen.start_feeders()
+        print(f"[WORKERS] {len(self.workers)} camera processes, KLV→tcp://{gen.TCP_HOST}:{gen.TCP_PORT} "
+              f"@ {float(gen.output_rate):g} FPS ({gen.PACING} pacing)")
+        try:
+            loop.run()
+        except KeyboardInterrupt:
+            print("Interrupted")
+        finally:
+            self.broadcast('stop')
+            for proc, _ in self.workers.values():
+                proc.join(timeout=5.0)
+            self._drain(loop)
+            pipeline.set_state(Gst.State.NULL)
+            gen.teardown()
+            self.report()
+
+    def report(self):
+        total = cpu = 0.0
+        for name in sorted(self.done):
+            d = self.done[name]
+            fps = d['frames'] / d['elapsed'] if d['elapsed'] > 0 else 0.0
+            total += fps
+            cpu += d['cpu_s'] / d['elapsed'] if d['elapsed'] > 0 else 0.0
+            print(f"[WORKER] {name}: {d['frames']} frames, {fps:.1f} fps, cpu_per_frame={1e3 * d['cpu_s'] / max(d['frames'], 1):.3f}ms")
+        print(f"[WORKERS] {len(self.done)}/{len(self.workers)} processes: fps_total={total:.1f} "
+              f"fps_per_camera={total / max(len(self.done), 1):.1f} cpu={100 * cpu:.0f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--bench', type=int, metavar='N', help="N looping cameras into fakesinks")
+    parser.add_argument('--image-dir', default=gen.IMAGE_DIR_LEFT)
+    parser.add_argument('--duration', type=float, default=10.0)
+    args = parser.parse_args()
+    if args.bench:
+        cameras = [{'name': f"cam{i}", 'image_dir': args.image_dir} for i in range(args.bench)]
+        Supervisor(cameras, sink="fakesink sync=false", klv_sink="fakesink sync=false",
+                   overrides={'LOOPS': 0, 'NET_CLOCK_PORT': None}).run(args.duration)
+    else:
+        Supervisor(gen.assign_ports(gen.CAMERAS)).run()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Fan-out of one payloaded stream to several SRT listeners (FANOUT in
+generator_slam.py): tee ! queue leaky=downstream ! srtserversink per
+subscriber, so the frame is encoded once and a slow or absent subscriber
+only loses its own packets.
+
+Each subscriber is a separate listener with its own URI (port), not an
+extra caller on the camera's listener: srtserversink would send to all of
+its callers from one input, with no per-subscriber queue to drop from.
+
+SubscriberStats counts what each subscriber queue received from the tee,
+what it handed to its sink and what it dropped.
+"""
+import threading
+import time
+
+import gi
+gi.require_version('Gst', '1.0')
+from gi.repository import Gst
+
+
+def fanout_sink(name, uris, sync, queue_buffers):
+    """Sink description: tee {name}_fan feeding one leaky queue + srtserversink per URI."""
+    desc = f"tee name={name}_fan "
+    for k, uri in enumerate(uris):
+        desc += (f"{name}_fan. ! queue name={name}_q{k} leaky=downstream max-size-buffers={queue_buffers} "
+                 f"max-size-bytes=0 max-size-time=0 ! srtserversink name={name}_srt{k} uri={uri} sync={sync} ")
+    return desc
+
+
+def srt_sink_stats(sink):
+    """
+    Numeric fields of an srtserversink 'stats' structure (first caller in
+    listener mode), {} while nobody is connected.
+    """
+    s = sink.get_property('stats')
+    if s is None:
+        return {}
+    if s.has_field('callers'):
+        callers = s.get_value('callers')
+        if not callers:
+            return {}
+        s = callers[0]
+    out = {}
+    for i in range(s.n_fields()):
+        key = s.nth_field_name(i)
+        value = s.get_value(key)
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            out[key] = value
+    return out
+
+
+class SubscriberStats:
+    def __init__(self, queue, sink, label):
+        self.queue = queue
+        self.sink = sink
+        self.label = label
+        self.received = 0
+        self.sent = 0
+        self.sent_bytes = 0
+        self._lock = threading.Lock()
+        self._last = (time.monotonic(), 0)
+        queue.get_static_pad('sink').add_probe(Gst.PadProbeType.BUFFER, self._on_in)
+        queue.get_static_pad('src').add_probe(Gst.PadProbeType.BUFFER, self._on_out)
+
+    def _on_in(self, pad, info):
+        with self._lock:
+            self.received += 1
+        return Gst.PadProbeReturn.OK
+
+    def _on_out(self, pad, info):
+        with self._lock:
+            self.sent += 1
+            self.sent_bytes += info.get_buffer().get_size()
+        return Gst.PadProbeReturn.OK
+
+    def dropped(self):
+        with self._lock:
+            return self.received - self.sent - self.queue.get_property('current-level-buffers')
+
+    def report(self):
+        now = time.monotonic()
+        t0, b0 = self._last
+        self._last = (now, self.sent_bytes)
+        rate = 8 * (self.sent_bytes - b0) / (now - t0) / 1e3 if now > t0 else 0.0
+        srt = srt_sink_stats(self.sink)
+        extra = " ".join(f"{k}={srt[k]}" for k in ('rtt-ms', 'packets-sent-lost', 'packets-retransmitted') if k in srt)
+        print(f"[FANOUT] {self.label}: packets={self.sent} bytes={self.sent_bytes} "
+              f"rate={rate:.0f}kbit/s dropped={max(self.dropped(), 0)} {extra}".rstrip())
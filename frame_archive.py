@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Packed frame archive: one data file with the JPEGs concatenated
+(<dir>.frames) and an offset/length index (<dir>.idx).
+
+Build from an image directory:
+    python frame_archive.py build /path/imgs_left_numbered /path/imgs_right_numbered --pattern img%05d.jpg
+
+The generators mmap the data file, so a frame is a slice of the page cache
+instead of a stat + open + read per file.
+"""
+import argparse
+import mmap
+import os
+import struct
+import sys
+
+MAGIC = b"FRIX"
+VERSION = 1
+_HEADER = struct.Struct("<4sHHII")   # magic, version, reserved, first index, count
+_ENTRY = struct.Struct("<QI")        # offset, length
+
+
+def archive_paths(base):
+    """<base>.frames, <base>.idx for an image dir or archive base path."""
+    base = base.rstrip(os.sep)
+    return base + ".frames", base + ".idx"
+
+
+def build(image_dir, pattern, start=1, out=None):
+    """Packs image_dir/pattern % start, start+1, ... up to the first missing file."""
+    data_path, idx_path = archive_paths(out or image_dir)
+    entries = []
+    offset = 0
+    with open(data_path + ".tmp", 'wb') as out_f:
+        idx = start
+        while True:
+            path = os.path.join(image_dir, pattern % idx)
+            if not os.path.exists(path):
+                break
+            with open(path, 'rb') as f:
+                data = f.read()
+            out_f.write(data)
+            entries.append((offset, len(data)))
+            offset += len(data)
+            idx += 1
+    with open(idx_path + ".tmp", 'wb') as f:
+        f.write(_HEADER.pack(MAGIC, VERSION, 0, start, len(entries)))
+        for e in entries:
+            f.write(_ENTRY.pack(*e))
+    os.replace(data_path + ".tmp", data_path)
+    os.replace(idx_path + ".tmp", idx_path)
+    print(f"[ARCHIVE] {image_dir}: {len(entries)} frames, {offset} bytes -> {data_path}")
+    return data_path, idx_path
+
+
+class FrameArchive:
+    """Read-only view of a packed archive; frames are addressed by dataset index."""
+
+    def __init__(self, base):
+        data_path, idx_path = archive_paths(base)
+        with open(idx_path, 'rb') as f:
+            raw = f.read()
+        magic, version, _, self.first, count = _HEADER.unpack_from(raw, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{idx_path}: not a frame archive index")
+        self.entries = list(_ENTRY.iter_unpack(raw[_HEADER.size:_HEADER.size + count * _ENTRY.size]))
+        self._file = open(data_path, 'rb')
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if count else b""
+        if count and hasattr(mmap, 'MADV_SEQUENTIAL'):
+            self._mm.madvise(mmap.MADV_SEQUENTIAL)
+        self.view = memoryview(self._mm)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, idx):
+        return 0 <= idx - self.first < len(self.entries)
+
+    def frame(self, idx):
+        """memoryview on the JPEG bytes of frame idx (no copy), or None if absent."""
+        if idx not in self:
+            return None
+        offset, length = self.entries[idx - self.first]
+        return self.view[offset:offset + length]
+
+    def close(self):
+        self.view.release()
+        if self.entries:
+            self._mm.close()
+        self._file.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest='cmd', required=True)
+    p_build = sub.add_parser('build', help="pack image directories")
+    p_build.add_argument('image_dirs', nargs='+')
+    p_build.add_argument('--pattern', default="img%05d.jpg")
+    p_build.add_argument('--start', type=int, default=1)
+    p_info = sub.add_parser('info', help="print archive summary")
+    p_info.add_argument('bases', nargs='+')
+    args = parser.parse_args()
+
+    if args.cmd == 'build':
+        for d in args.image_dirs:
+            build(d, args.pattern, args.start)
+    else:
+        for base in args.bases:
+            a = FrameArchive(base)
+            total = sum(length for _, length in a.entries)
+            print(f"{base}: frames {a.first}..{a.first + len(a) - 1}, {total} bytes")
+            a.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
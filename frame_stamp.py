@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Machine-readable frame stamp (FRAME_STAMP in generator_slam.py).
+
+The frame id and the send time (ns, generator pipeline clock) are burnt
+into the top-left corner of the frame as a ROWS x COLS grid of CELL px
+black/white cells:
+
+    sync (16 bits) | frame id (32) | send time (64) | CRC-16 of id + time (16)
+
+Cells are 8 px and start at (0, 0), so each one fills whole JPEG blocks and
+survives re-encoding. The cells are neutral grey levels, so chroma
+subsampling does not matter. The decoder averages the centre of each cell
+for a whole batch of frames at once. A frame whose sync word or CRC does
+not match is reported invalid instead of yielding a wrong id.
+"""
+import struct
+from binascii import crc_hqx
+
+import numpy as np
+
+CELL = 8
+ROWS, COLS = 4, 32
+SYNC = b"\xa5\x3c"
+BLACK, WHITE = 16, 235
+
+_BODY = struct.Struct(">IQ")
+
+
+def payload(index, t_ns):
+    body = _BODY.pack(index & 0xFFFFFFFF, t_ns & 0xFFFFFFFFFFFFFFFF)
+    return SYNC + body + struct.pack(">H", crc_hqx(body, 0xFFFF))
+
+
+def stamp(img, index, t_ns, cell=CELL):
+    """Writes the stamp into img (H, W[, C] uint8) in place and returns it."""
+    bits = np.unpackbits(np.frombuffer(payload(index, t_ns), np.uint8)).reshape(ROWS, COLS)
+    block = np.where(bits, WHITE, BLACK).astype(np.uint8).repeat(cell, 0).repeat(cell, 1)
+    img[:ROWS * cell, :COLS * cell] = block[..., None] if img.ndim == 3 else block
+    return img
+
+
+def stamp_jpeg(data, index, t_ns, quality=90, cell=CELL):
+    """JPEG bytes with the stamp burnt in, None if the frame does not decode or is too small."""
+    import cv2  # only the generator's FRAME_STAMP stage needs OpenCV
+    img = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_UNCHANGED)
+    if img is None or img.shape[0] < ROWS * cell or img.shape[1] < COLS * cell:
+        return None
+    ok, out = cv2.imencode(".jpg", stamp(img, index, t_ns, cell), [cv2.IMWRITE_JPEG_QUALITY, quality])
+    return out.tobytes() if ok else None
+
+
+def decode_batch(frames, cell=CELL):
+    """
+    frames: (N, H, W) or (N, H, W, C) uint8. Returns (index, t_ns, valid)
+    arrays of shape (N,); index and t_ns are 0 where valid is False.
+    """
+    a = np.asarray(frames)[:, :ROWS * cell, :COLS * cell]
+    n = a.shape[0]
+    if a.shape[1:3] != (ROWS * cell, COLS * cell):
+        return np.zeros(n, np.uint32), np.zeros(n, np.uint64), np.zeros(n, bool)
+    if a.ndim == 4:
+        a = a.mean(axis=3)
+    m = cell // 4
+    cells = a.reshape(n, ROWS, cell, COLS, cell)[:, :, m:cell - m, :, m:cell - m].mean(axis=(2, 4))
+    raw = np.packbits(cells.reshape(n, ROWS * COLS) > (BLACK + WHITE) / 2, axis=1)
+    index = raw[:, 2:6].copy().view(">u4")[:, 0].astype(np.uint32)
+    t_ns = raw[:, 6:14].copy().view(">u8")[:, 0].astype(np.uint64)
+    crc = raw[:, 14:16].copy().view(">u2")[:, 0]
+    valid = (raw[:, 0] == SYNC[0]) & (raw[:, 1] == SYNC[1])
+    valid &= np.array([crc_hqx(row[2:14].tobytes(), 0xFFFF) for row in raw], np.uint16) == crc
+    return np.where(valid, index, 0), np.where(valid, t_ns, 0), valid
+
+
+def decode(frame, cell=CELL):
+    """(frame id, send time ns, valid) of one frame (H, W[, C])."""
+    index, t_ns, valid = decode_batch(np.asarray(frame)[None], cell)
+    return int(index[0]), int(t_ns[0]), bool(valid[0])
@@ -7,6 +7,8 @@ import info_pb2
 from google.protobuf.timestamp_pb2 import Timestamp
 import hashlib
 import struct
+from jpeg_passthrough import check_jpeg, PassthroughStats
+from jpeg_reencode import JpegReencoder
 
 gi.require_version('Gst', '1.0')
 from gi.repository import Gst, GLib
@@ -31,30 +33,77 @@ VIDEO_SRT_URI_RIGHT = "srt://127.0.0.1:6021?mode=listener"
 TCP_HOST            = "127.0.0.1"
 TCP_PORT            = 7000
 
+# Send the dataset JPEGs as-is (jpegparse ! rtpjpegpay) and only re-encode
+# the frames rtpjpegpay cannot payload
+JPEG_PASSTHROUGH    = True
+
 # Initialize GStreamer and keys/indexes
 Gst.init(None)
 _key = hashlib.md5(b"StreamInfo").digest()
 frame_duration = Gst.SECOND // FPS
 video_indexes = {IMAGE_DIR_LEFT: 1, IMAGE_DIR_RIGHT: 1}
 meta_indexes  = {IMAGE_DIR_LEFT: 1, IMAGE_DIR_RIGHT: 1}
+jpeg_stats = PassthroughStats()
+reencoder = None   # JpegReencoder of the passthrough fallback, see start_reencoder
 
 
 frame_pts = {}
 
-def on_need_data_video(appsrc, length, image_dir):
+def start_reencoder():
+    """Side pipeline of the passthrough fallback, started from main() before PLAYING."""
+    global reencoder
+    if JPEG_PASSTHROUGH and reencoder is None:
+        reencoder = JpegReencoder()
+
+def push_next_video(appsrc, image_dir):
+    """
+    Pushes frame video_indexes[image_dir] and moves on. False at the end of
+    the sequence, None if the frame does not decode (nothing pushed).
+    """
     idx = video_indexes[image_dir]
     path = os.path.join(image_dir, PATTERN % idx)
     if not os.path.exists(path):
         appsrc.emit('end-of-stream')
-        return
+        return False
     with open(path, 'rb') as f:
         data = f.read()
+    if reencoder is not None:
+        # passthrough mode: frames rtpjpegpay can't payload are re-encoded here,
+        # on the same appsrc so they keep their place in PTS order
+        ok, reason = check_jpeg(data)
+        jpeg_stats.record(image_dir, ok, reason)
+        if not ok:
+            data = reencoder.encode(data)
+        if data is None:
+            print(f"[JPEG] {path} does not decode, skipped")
+            video_indexes[image_dir] += 1
+            return None
     buf = Gst.Buffer.new_allocate(None, len(data), None)
     buf.fill(0, data)
     buf.pts = (idx - 1) * frame_duration
     buf.duration = frame_duration
     appsrc.emit('push-buffer', buf)
     video_indexes[image_dir] += 1
+    return True
+
+def on_need_data_video(appsrc, length, image_dir):
+    # need-data only comes back after a push: go on to the next frame that decodes
+    alive = push_next_video(appsrc, image_dir)
+    while alive is None:
+        alive = push_next_video(appsrc, image_dir)
+    return alive
+
+def video_branch(name, chk, sink):
+    """Pipeline fragment for one camera: appsrc `name` -> RTP/JPEG -> `sink`."""
+    src = f"appsrc name={name} caps=\"image/jpeg,framerate={FPS}/1\" is-live=true block=true format=time ! "
+    if not JPEG_PASSTHROUGH:
+        return src + f"decodebin ! videoconvert ! video/x-raw,format=I420 ! jpegenc name={chk} ! rtpjpegpay mtu=1316 ! {sink} "
+    # Frames go straight to the payloader; the ones it can't take are
+    # re-encoded by on_need_data_video before the push
+    return src + f"jpegparse name={chk} ! rtpjpegpay mtu=1316 ! {sink} "
+
+def connect_video(pipeline, name, image_dir):
+    pipeline.get_by_name(name).connect('need-data', on_need_data_video, image_dir)
 
 def make_meta_callback(image_dir):
     def on_need_data_meta(appsrc, length):
@@ -89,14 +138,10 @@ def main():
     # Build pipeline
     pipeline_desc = (
         # Video left
-        f"appsrc name=vid_left caps=\"image/jpeg,framerate={FPS}/1\" is-live=true block=true format=time ! "
-        "decodebin ! videoconvert ! video/x-raw,format=I420 ! jpegenc name=chk1 ! rtpjpegpay mtu=1316 ! "
-        f"srtserversink uri={VIDEO_SRT_URI_LEFT} "
+        video_branch("vid_left", "chk1", f"srtserversink uri={VIDEO_SRT_URI_LEFT}") +
 
         # Video right
-        f"appsrc name=vid_right caps=\"image/jpeg,framerate={FPS}/1\" is-live=true block=true format=time ! "
-        "decodebin ! videoconvert ! video/x-raw,format=I420 ! jpegenc name=chk2 ! rtpjpegpay mtu=1316 ! "
-        f"srtserversink uri={VIDEO_SRT_URI_RIGHT} "
+        video_branch("vid_right", "chk2", f"srtserversink uri={VIDEO_SRT_URI_RIGHT}") +
 
         # Metadata left with pacing by PTS
         f"appsrc name=klv_left caps=\"meta/x-klv,parsed=true,framerate={FPS}/1\" is-live=true block=true format=time ! "
@@ -114,8 +159,9 @@ def main():
     pipeline = Gst.parse_launch(pipeline_desc)
 
     # Connect callbacks
-    pipeline.get_by_name('vid_left').connect('need-data', on_need_data_video, IMAGE_DIR_LEFT)
-    pipeline.get_by_name('vid_right').connect('need-data', on_need_data_video, IMAGE_DIR_RIGHT)
+    start_reencoder()
+    connect_video(pipeline, 'vid_left', IMAGE_DIR_LEFT)
+    connect_video(pipeline, 'vid_right', IMAGE_DIR_RIGHT)
     pipeline.get_by_name('klv_left').connect('need-data', make_meta_callback(IMAGE_DIR_LEFT))
     pipeline.get_by_name('klv_right').connect('need-data', make_meta_callback(IMAGE_DIR_RIGHT))
 
@@ -158,6 +204,10 @@ def main():
         print("Interrupted")
     finally:
         pipeline.set_state(Gst.State.NULL)
+        if reencoder is not None:
+            reencoder.close()
+        if JPEG_PASSTHROUGH:
+            jpeg_stats.report()
 
 if __name__ == '__main__':
     main()
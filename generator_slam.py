@@ -1,12 +1,27 @@
 
 #!/usr/bin/env python3
-import os
 import time
 import gi
-import info_pb2
-from google.protobuf.timestamp_pb2 import Timestamp
-import hashlib
-import struct
+import sys
+import threading
+from fractions import Fraction
+from jpeg_passthrough import check_jpeg, jpeg_size, PassthroughStats, MAX_DIMENSION
+from prefetch import FramePrefetcher
+from frame_archive import FrameArchive
+from manifest import DatasetManifest, Playback
+from klv_track import KlvTrack
+from ts_transport import HEADER_SIZE, jpeg_header, unit_spans, stream_pids, parse_streamid
+from rtp_frame_id import FrameIdRelay
+from packet_cache import CachingRelay
+from pacer import Pacer, FrameScheduler, JitterStats, DeferredSrc
+from stereo_pack import x_offsets
+from fanout import fanout_sink, SubscriberStats
+from live_ingest import DirWatcher
+from adaptive import QualityController
+from telemetry import Telemetry
+from net_clock import provide, format_clock_id
+from frame_stamp import stamp_jpeg
+from jpeg_reencode import JpegReencoder
 
 gi.require_version('Gst', '1.0')
 from gi.repository import Gst, GLib
@@ -26,50 +41,922 @@ PATTERN             = "img%05d.jpg"
 
 FPS                 = 4
 
-VIDEO_SRT_URI_LEFT  = "srt://127.0.0.1:6020?mode=listener"
-VIDEO_SRT_URI_RIGHT = "srt://127.0.0.1:6021?mode=listener"
+# Replay speed: PTS and caps framerate of video and KLV are scaled by SPEED
+# (2 = twice real time). UNPACED turns off clock sync in the sinks so frames
+# go out as fast as they are accepted; the sustained rate is printed at the end.
+SPEED               = 1
+UNPACED             = False
+
+# "appsrc":    buffers pulled by appsrc need-data, paced by the sinks' clock sync
+# "scheduler": pacer.Pacer pushes every video/KLV buffer at its target time on
+#              the monotonic clock (sinks sync=false) and reports p50/p99/max
+#              emit jitter per stream every STATS_INTERVAL_S
+# "coupled":   pacer.FrameScheduler owns the frame index, builds the video
+#              and KLV buffers of all cameras for one frame, then pushes
+#              them back to back (sinks sync=false); reports lateness per
+#              frame and the skew of each stream's push after the first one
+# "feeder":    one thread per camera pushes FEED_BATCH frames of video and
+#              KLV per call as a Gst.BufferList (push-buffer-list), no
+#              need-data; the blocking appsrc holds it back once FEED_MAX_BYTES
+#              are queued and the sinks' clock sync paces the output
+PACING              = "appsrc"
+PACER_SPIN_S        = 0.0005
+FEED_BATCH          = 8
+FEED_MAX_BYTES      = 16 * 1024 * 1024
+
+# One video branch (SRT listener) and one KLV stream per camera. Ports are
+# assigned in order from VIDEO_SRT_BASE_PORT unless a camera sets 'port'.
+# `python camera_workers.py` runs each camera's video branch in its own process.
+CAMERAS = [
+    {'name': 'left',  'image_dir': IMAGE_DIR_LEFT},
+    {'name': 'right', 'image_dir': IMAGE_DIR_RIGHT},
+]
+VIDEO_SRT_HOST      = "127.0.0.1"
+VIDEO_SRT_BASE_PORT = 6020
 TCP_HOST            = "127.0.0.1"
 TCP_PORT            = 7000
+SESSION_NAME        = "Session Offline"
+
+# "rtp": one RTP/JPEG SRT link per camera, KLV of all cameras over TCP
+# "ts":  video and KLV of all cameras in one MPEG-TS (common PCR) over a
+#        single SRT link on TS_SRT_PORT, read by sync_ts.py; JPEGs over
+#        64 KiB are split into several KLV units (ts_transport.KLV_UNIT_MAX)
+TRANSPORT           = "rtp"
+TS_SRT_PORT         = 6030
+# All cameras share this one listener socket. Callers request cameras by
+# SRT streamid (ts_transport.format_streamid, e.g. "#!::r=left+right,m=request");
+# requests naming an unknown camera are rejected in caller-connecting
+# (GStreamer >= 1.22). Each accepted caller receives the whole TS and
+# demuxes its cameras' PIDs. TS_REQUIRE_STREAMID also rejects callers
+# that send no streamid.
+TS_REQUIRE_STREAMID = False
+
+# RTP transport: tag the first packet of each frame with the frame id and
+# trig_id in an RTP header extension (rtp_frame_id.py); the KLV carries the
+# same id, so clients join by exact id instead of PTS buckets. Opt-in: every
+# RTP packet then goes through a Python appsink -> appsrc relay, which costs
+# throughput with many cameras. Clients need JOIN_BY_FRAME_ID to match.
+RTP_FRAME_ID        = False
+
+# Send the dataset JPEGs as-is (jpegparse ! rtpjpegpay) and only re-encode
+# the frames rtpjpegpay cannot payload
+JPEG_PASSTHROUGH    = True
+
+# RTP video codec (TRANSPORT = "rtp" only): "jpeg" (RTP/JPEG) or "h264"
+# (x264enc tune=zerolatency, IDR every H264_GOP frames, no B-frames, so the
+# output PTS stay those of the input frames)
+CODEC               = "jpeg"
+H264_GOP            = 15
+H264_BITRATE_KBPS   = 4000
+
+# RTP transport: composite the frames of all CAMERAS side by side (CAMERAS
+# order) into one video stream on the first camera's port, so a stereo pair
+# is atomic on the wire; KLV stays per camera. Clients split it back with
+# stereo_pack.split_views. With CODEC = "jpeg" the packed frame must fit
+# RTP/JPEG (RFC 2435): 2040 px wide at most, use "h264" for wider pairs.
+STEREO_PACK         = False
+
+# RTP transport, per camera: also publish a downscaled RTP/JPEG preview
+# (PREVIEW_WIDTH px wide, aspect kept, jpegenc quality PREVIEW_QUALITY) on
+# port + PREVIEW_PORT_OFFSET, with the same PTS and frame ids as the full
+# stream. The preview queue is leaky: a stalled preview never holds back
+# the full stream. Not available with STEREO_PACK.
+PREVIEW             = False
+PREVIEW_WIDTH       = 320
+PREVIEW_QUALITY     = 50
+PREVIEW_PORT_OFFSET = 100
+
+# RTP transport: number of SRT listeners per camera video stream, fed from
+# one tee after the payloader (encode once). Subscriber k listens on
+# port + k * FANOUT_PORT_STEP, behind its own leaky queue of
+# FANOUT_QUEUE_BUFFERS packets; send stats are printed every STATS_INTERVAL_S.
+# One listener per subscriber, not several callers on the camera's port:
+# a shared srtserversink has a single input, so a slow caller could not get
+# its own leaky queue. Each client connects to its own port (k = 0 is the
+# camera's usual port), e.g. left: 6020 (SLAM), 6220 (recorder).
+FANOUT              = 1
+FANOUT_PORT_STEP    = 200
+FANOUT_QUEUE_BUFFERS = 512
+
+# RTP transport: re-encode every frame (replaces JPEG_PASSTHROUGH) and adapt
+# it to the SRT link. Every ADAPT_INTERVAL_MS adaptive.QualityController
+# reads the camera's srtserversink stats and moves along ADAPT_LADDER of
+# (jpegenc quality, scale); with CODEC = "h264" quality scales the x264enc
+# bitrate. Steps down on rising RTT / retransmissions / link utilisation,
+# back up after a calm period; every change is logged as [ADAPT].
+ADAPTIVE_QUALITY    = False
+ADAPT_INTERVAL_MS   = 500
+ADAPT_LADDER        = [(85, 1.0), (70, 1.0), (55, 1.0), (55, 0.75), (45, 0.5)]
+
+# Background read-ahead of the next frames of each image dir (0 = read in the
+# need-data callback), with a byte budget per dir
+PREFETCH_DEPTH      = 8
+PREFETCH_MAX_BYTES  = 64 * 1024 * 1024
+STATS_INTERVAL_S    = 10
+
+# JSON-lines telemetry every TELEMETRY_INTERVAL_S (telemetry.py): appsrc
+# levels, need-data rate and time spent in the callbacks, bytes/s per sink.
+# None = off, "-" = stdout, else a file path (appended).
+TELEMETRY_PATH      = None
+TELEMETRY_INTERVAL_S = 1.0
+
+# Read frames from the packed archive <image_dir>.frames/.idx built with
+# `python frame_archive.py build <image_dir> --pattern <PATTERN>` (no prefetch needed)
+FRAME_ARCHIVE       = False
+
+# Playback range in dataset indexes (None = whole dir) and number of passes
+# (0 = loop forever). PTS keep increasing across loops and seeks.
+# Type "seek <index>" on stdin to jump without restarting the pipeline.
+START_FRAME         = None
+END_FRAME           = None
+LOOPS               = 1
+
+# Live ingest: instead of replaying the dataset, watch each camera's
+# image_dir with inotify (live_ingest.py) and push every new frame as soon
+# as its writer closes it, until Ctrl-C. PTS from the arrival time
+# ("arrival", pipeline running time) or the filename index ("index"); the
+# frame id is the filename index, so cameras still join on it. The
+# write-to-send latency (inotify event -> packet at the frame id relay) is
+# printed every STATS_INTERVAL_S. Not available with STEREO_PACK.
+LIVE_INGEST         = False
+LIVE_PTS            = "arrival"
+
+# RTP transport, LOOPS != 1: record the RTP packets of each camera's first
+# pass at the relay in front of its sink and replay the later passes from
+# memory (packet_cache.py), with PTS, RTP timestamps, sequence numbers and
+# frame ids rewritten. The KLV keeps being generated per frame: its
+# systemtime must be current. No seek, no STEREO_PACK or LIVE_INGEST.
+# PACKET_CACHE_MAX_BYTES caps the memory of each relay's cache (camera or
+# preview stream); the rest of the first pass is spilled to a temporary file.
+PACKET_CACHE        = False
+PACKET_CACHE_MAX_BYTES = 512 * 1024 * 1024
+
+# StreamInfo fields set per frame in the KLV: id = frame sequence number of
+# the camera, trig_id = capture shared by all cameras (same output frame),
+# pts = buffer PTS in ns; id/trig_id match the RTP frame id extension
+KLV_FIELDS          = ('id', 'trig_id', 'pts')
+
+# Burn the frame id and its send time into the top-left corner of every
+# video frame as a grid of 8 px black/white cells (frame_stamp.py), JPEG
+# re-encoded at FRAME_STAMP_QUALITY (needs OpenCV). The send time is on the
+# pipeline clock (ns): base time + PTS when the sinks sync, else the push
+# time. Clients decode it from the pixels (sync_slam2.py STAMP_CHECK) for
+# per-frame end-to-end latency and frame id checks without the KLV.
+# Previews are too small to read. Not with PACKET_CACHE, whose replayed
+# passes would carry first-pass stamps.
+FRAME_STAMP         = False
+FRAME_STAMP_QUALITY = 90
+
+# Serve the pipeline clock with GstNetTimeProvider on NET_CLOCK_PORT (None =
+# off) and fix the base time just before PLAYING; every KLV then carries
+# StreamInfo.clock_id = "NET_CLOCK_HOST:NET_CLOCK_PORT/base_time" so the
+# clients slave their pipelines to the same clock and base time
+# (net_clock.py) and running times compare across machines.
+NET_CLOCK_PORT      = 8555
+NET_CLOCK_HOST      = "127.0.0.1"
 
 # Initialize GStreamer and keys/indexes
 Gst.init(None)
-_key = hashlib.md5(b"StreamInfo").digest()
-frame_duration = Gst.SECOND // FPS
-video_indexes = {IMAGE_DIR_LEFT: 1, IMAGE_DIR_RIGHT: 1}
-meta_indexes  = {IMAGE_DIR_LEFT: 1, IMAGE_DIR_RIGHT: 1}
-
-def on_need_data_video(appsrc, length, image_dir):
-    idx = video_indexes[image_dir]
-    path = os.path.join(image_dir, PATTERN % idx)
-    if not os.path.exists(path):
+output_rate = Fraction(FPS) * Fraction(SPEED).limit_denominator(1000)
+frame_duration = Gst.SECOND * output_rate.denominator // output_rate.numerator
+caps_framerate = f"{output_rate.numerator}/{output_rate.denominator}"
+run_clock = {}
+# Per-camera state, keyed by camera name
+video_indexes = {}
+meta_indexes  = {}
+jpeg_stats = PassthroughStats()
+reencoder = None   # JpegReencoder shared by all cameras, see start_reencoder
+prefetchers = {}
+archives = {}
+playbacks = {}
+klv_tracks = {}
+klv_clock_id = ""
+net_provider = None
+relays = {}
+fanouts = {}
+controllers = {}
+watchers = {}
+live_pending = {}   # name -> {pts: (inotify event time, filename index)}
+live_preview_ids = {}
+live_lock = threading.Lock()
+live_first = {}
+live_latency = JitterStats(tag="LATENCY")
+pacer = None
+feeders = {}
+feeding = threading.Event()
+telemetry = None
+
+def assign_ports(cameras):
+    used = {cam['port'] for cam in cameras if 'port' in cam}
+    port = VIDEO_SRT_BASE_PORT
+    for cam in cameras:
+        if 'port' not in cam:
+            while port in used:
+                port += 1
+            cam['port'] = port
+            used.add(port)
+    for cam in cameras:
+        cam.setdefault('preview_port', cam['port'] + PREVIEW_PORT_OFFSET)
+    return cameras
+
+def srt_uri(cam, port_key='port'):
+    return f"srt://{VIDEO_SRT_HOST}:{cam[port_key]}?mode=listener"
+
+def subscriber_uris(cam):
+    return [f"srt://{VIDEO_SRT_HOST}:{cam['port'] + k * FANOUT_PORT_STEP}?mode=listener" for k in range(FANOUT)]
+
+def with_preview():
+    return PREVIEW and TRANSPORT == "rtp" and not STEREO_PACK
+
+def load_manifest(cam):
+    name, image_dir = cam['name'], cam['image_dir']
+    if FRAME_ARCHIVE:
+        archives[name] = FrameArchive(image_dir)
+        manifest = DatasetManifest.from_archive(archives[name], image_dir, PATTERN)
+    else:
+        manifest = DatasetManifest.scan(image_dir, PATTERN)
+    manifest.report()
+    playbacks[name] = Playback(manifest, START_FRAME, END_FRAME, LOOPS)
+    # KLV packets of the whole range serialized once, only systemtime is patched per frame
+    klv_tracks[name] = make_klv_track(name)
+
+def make_klv_track(name):
+    return KlvTrack([e.path for e in playbacks[name].entries], SESSION_NAME,
+                    fields=KLV_FIELDS, clock_id=klv_clock_id)
+
+def start_net_clock(pipeline, base_time=None):
+    """Serves the pipeline clock, fixes the base time (default: now) and puts both in the KLV."""
+    global net_provider, klv_clock_id
+    net_provider, base_time = provide(pipeline, NET_CLOCK_PORT, base_time=base_time)
+    klv_clock_id = format_clock_id(NET_CLOCK_HOST, NET_CLOCK_PORT, base_time)
+    for name in klv_tracks:
+        klv_tracks[name] = make_klv_track(name)
+    print(f"[CLOCK] serving pipeline clock on port {NET_CLOCK_PORT}, clock_id {klv_clock_id}")
+
+def read_frame(name, idx):
+    """JPEG bytes of output frame idx (1-based) of camera `name`, None at the end of playback."""
+    if caching() and idx > len(playbacks[name].entries):
+        return None  # later passes come from the packet cache
+    entry = playbacks[name].entry_at(idx - 1)
+    if entry is None:
+        return None
+    if name in archives:
+        view = archives[name].frame(entry.index)
+        if view is None:
+            return None
+        # one copy out of the mapping, and no view left exported for FrameArchive.close()
+        try:
+            return bytes(view)
+        finally:
+            view.release()
+    try:
+        with open(entry.path, 'rb') as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+def seek(index, at=None):
+    """
+    Plays dataset index `index` from output frame `at` (1-based) on, the same
+    frame for every camera and stream so video and KLV switch together.
+    Default: the frame after the furthest any stream has read.
+    """
+    if caching():
+        print("[SEEK] not available with PACKET_CACHE")
+        return False
+    if at is None:
+        # one frame of margin: the frame at max(...) may be read right now
+        at = max(max(video_indexes.values(), default=1), max(meta_indexes.values(), default=1)) + 1
+    for name, playback in playbacks.items():
+        done = max(video_indexes[name], meta_indexes[name]) - 1
+        if done >= at:
+            print(f"[SEEK] {name}: output frame {at} already read (at {done}), later frames follow the seek")
+        playback.seek(index, at - 1)
+        if name in prefetchers:
+            prefetchers[name].reset(video_indexes[name])
+        print(f"[SEEK] {name}: index {index} from output frame {at}")
+    return False
+
+def read_commands():
+    for line in sys.stdin:
+        cmd = line.split()
+        if len(cmd) == 2 and cmd[0] == 'seek' and cmd[1].isdigit():
+            GLib.idle_add(seek, int(cmd[1]))
+        elif cmd:
+            print(f"[CMD] unknown command: {line.strip()} (expected: seek <index>)")
+
+def start_prefetch(name):
+    prefetchers[name] = FramePrefetcher(
+        lambda idx: read_frame(name, idx), start=video_indexes[name],
+        depth=PREFETCH_DEPTH, max_bytes=PREFETCH_MAX_BYTES, name=name)
+
+def report_stats():
+    for p in prefetchers.values():
+        p.report()
+    for subscribers in fanouts.values():
+        for sub in subscribers:
+            sub.report()
+    if watchers:
+        live_latency.report()
+    return True
+
+def make_video_buffer(data):
+    if TRANSPORT == "ts":
+        # JPEG as a key+length framed private stream, see ts_transport.py
+        buf = Gst.Buffer.new_allocate(None, HEADER_SIZE + len(data), None)
+        buf.fill(0, jpeg_header(len(data)))
+        buf.fill(HEADER_SIZE, data)
+    else:
+        buf = Gst.Buffer.new_wrapped(data)
+    return buf
+
+def ts_units(buf):
+    """
+    buf as pushed on its appsrc: in TS mode, frames over KLV_UNIT_MAX are
+    split into sub-buffers (same memory, same PTS) mpegtsmux accepts.
+    """
+    if TRANSPORT != "ts":
+        return [buf]
+    spans = unit_spans(buf.get_size())
+    if len(spans) == 1:
+        return [buf]
+    units = []
+    for i, (offset, size) in enumerate(spans):
+        unit = buf.copy_region(Gst.BufferCopyFlags.MEMORY, offset, size)
+        unit.pts = buf.pts
+        unit.duration = buf.duration if i == len(spans) - 1 else 0
+        units.append(unit)
+    return units
+
+def stamped(appsrc, data, frame_id, pts):
+    """data with frame_id and its send time burnt in, as-is if it does not decode."""
+    now = Gst.SystemClock.obtain().get_time()
+    base = appsrc.get_base_time()
+    send = max(now, base + pts) if not scheduled() and not UNPACED and base else now
+    return stamp_jpeg(data, frame_id, send, FRAME_STAMP_QUALITY) or data
+
+def needs_fallback(name, data):
+    if not uses_jpeg_fallback():
+        return False
+    # passthrough mode: frames rtpjpegpay can't payload are re-encoded before the push
+    ok, reason = check_jpeg(data)
+    jpeg_stats.record(name, ok, reason)
+    return not ok
+
+def push_video(appsrc, name, data, buf):
+    """Pushes buf, re-encoded first if rtpjpegpay can't take it; False if it does not decode (nothing pushed)."""
+    if needs_fallback(name, data):
+        buf = reencoded(name, data, buf)
+        if buf is None:
+            return False
+    for unit in ts_units(buf):
+        appsrc.emit('push-buffer', unit)
+    return True
+
+def start_reencoder():
+    """JpegReencoder of the passthrough fallback, started once from the main thread."""
+    global reencoder
+    if uses_jpeg_fallback() and reencoder is None:
+        reencoder = JpegReencoder()
+
+def reencoded(name, data, buf):
+    """buf with data re-encoded to baseline JPEG (same PTS), None if it does not decode."""
+    fixed = reencoder.encode(data)
+    if fixed is None:
+        print(f"[JPEG] {name}: frame at {buf.pts / Gst.SECOND:.3f}s does not decode, dropped")
+        return None
+    out = make_video_buffer(fixed)
+    out.pts = buf.pts
+    out.duration = buf.duration
+    return out
+
+def video_buffer(appsrc, name, idx):
+    """(JPEG bytes, buffer) of output frame idx, None at the end of playback."""
+    if name in prefetchers:
+        item = prefetchers[name].get()
+        # a seek can reset the prefetcher between a get() and the index bump,
+        # which re-queues frames already pushed: drop them
+        while item is not None and item[0] < idx:
+            item = prefetchers[name].get()
+        if item is None:
+            data = None
+        elif item[0] == idx:
+            data = item[1]
+        else:
+            data = read_frame(name, idx)
+            prefetchers[name].reset(idx + 1)
+    else:
+        data = read_frame(name, idx)
+    if data is None:
+        return None
+    if FRAME_STAMP:
+        data = stamped(appsrc, data, idx, (idx - 1) * frame_duration)
+    buf = make_video_buffer(data)
+    buf.pts = (idx - 1) * frame_duration
+    buf.duration = frame_duration
+    return data, buf
+
+def feed_camera(name, vid, klv):
+    """
+    Feeder thread of one camera (PACING = "feeder"): up to FEED_BATCH frames
+    per push-buffer-list on vid and klv (either may be None), until the end
+    of playback. Frames rtpjpegpay can't payload are re-encoded here and
+    stay in the list: everything goes through vid, in PTS order.
+    """
+    def flush(src, blist):
+        # blocks while the appsrc queue is over max-bytes
+        return not blist.length() or src.emit('push-buffer-list', blist) == Gst.FlowReturn.OK
+
+    while feeding.is_set():
+        videos, metas = Gst.BufferList.new(), Gst.BufferList.new()
+        end = False
+        for _ in range(FEED_BATCH):
+            item = kbuf = None
+            if vid is not None:
+                item = video_buffer(vid, name, video_indexes[name])
+                end = item is None
+            if klv is not None and not end:
+                kbuf = meta_buffer(name, meta_indexes[name])
+                end = kbuf is None
+            if end:
+                break
+            if item is not None:
+                data, buf = item
+                if needs_fallback(name, data):
+                    buf = reencoded(name, data, buf)
+                if buf is not None:
+                    for unit in ts_units(buf):
+                        videos.insert(-1, unit)
+                video_indexes[name] += 1
+            if kbuf is not None:
+                metas.insert(-1, kbuf)
+                meta_indexes[name] += 1
+        if not (flush(vid, videos) and flush(klv, metas)):
+            return
+        if end:
+            for src in (vid, klv):
+                if src is not None:
+                    src.emit('end-of-stream')
+            return
+
+def start_feeders():
+    feeding.set()
+    for thread in feeders.values():
+        thread.start()
+
+def next_video(appsrc, name):
+    """
+    Pushes frame video_indexes[name] of the camera and moves on. False at the
+    end of playback, None if the frame does not decode (nothing pushed).
+    """
+    item = video_buffer(appsrc, name, video_indexes[name])
+    if item is None:
         appsrc.emit('end-of-stream')
+        return False
+    pushed = push_video(appsrc, name, *item)
+    video_indexes[name] += 1
+    return True if pushed else None
+
+def on_need_data_video(appsrc, length, name):
+    # need-data only comes back after a push: go on to the next frame that decodes
+    alive = next_video(appsrc, name)
+    while alive is None:
+        alive = next_video(appsrc, name)
+    return alive
+
+def frame_ids(pts):
+    """(frame id, trig_id) of the frame with this PTS: the 1-based output frame number, shared by all cameras."""
+    n = pts // frame_duration + 1
+    return n, n
+
+def rtp_payloader(chk, codec=None):
+    """Encoder/payloader fragment from raw I420 (h264) or JPEG (jpeg) to RTP."""
+    if (codec or CODEC) == "h264":
+        return (f"x264enc name={chk} tune=zerolatency speed-preset=ultrafast key-int-max={H264_GOP} "
+                f"bframes=0 bitrate={H264_BITRATE_KBPS} ! video/x-h264,profile=baseline ! "
+                "rtph264pay config-interval=-1 mtu=1316 pt=96")
+    return "rtpjpegpay mtu=1316"
+
+def stereo_packed():
+    return STEREO_PACK and TRANSPORT == "rtp"
+
+def with_adaptive():
+    return ADAPTIVE_QUALITY and TRANSPORT == "rtp" and not STEREO_PACK
+
+def uses_jpeg_fallback():
+    # TS carries any JPEG as-is, only RTP/JPEG needs the re-encode fallback
+    return JPEG_PASSTHROUGH and TRANSPORT == "rtp" and CODEC == "jpeg" and not STEREO_PACK and not with_adaptive()
+
+def scheduled():
+    """Buffers are pushed by the pacer thread instead of appsrc need-data."""
+    return PACING in ("scheduler", "coupled")
+
+def coupled(appsrc, indexes, name, emit):
+    """
+    FrameScheduler preparer: emit(src) builds the stream's buffer of frame n,
+    whatever its own counter says, on a DeferredSrc the scheduler pushes later.
+    """
+    def prepare(n):
+        indexes[name] = n
+        src = DeferredSrc(appsrc)
+        alive = emit(src)
+        return src.push, alive
+    return prepare
+
+def caching():
+    return PACKET_CACHE and LOOPS != 1 and TRANSPORT == "rtp" and not STEREO_PACK and not LIVE_INGEST
+
+def relay_sink(name, sink):
+    if not (RTP_FRAME_ID or caching()):
+        return sink
+    # packets go through FrameIdRelay / CachingRelay: {name}_pay -> python -> {name}_rtp
+    return (f"appsink name={name}_pay emit-signals=true sync=false "
+            f"appsrc name={name}_rtp is-live=true block=true format=time ! {sink}")
+
+def preview_branch(name, sink):
+    """Downscaled RTP/JPEG rendition of the JPEG frames on tee {name}_t."""
+    sink = relay_sink(f"{name}_prev", sink)
+    return (f"{name}_t. ! queue max-size-buffers=2 leaky=downstream ! jpegdec ! videoscale ! "
+            f"video/x-raw,width={PREVIEW_WIDTH} ! videoconvert ! video/x-raw,format=I420 ! "
+            f"jpegenc quality={PREVIEW_QUALITY} ! rtpjpegpay mtu=1316 ! {sink} ")
+
+def video_branch(name, chk, sink, preview_sink=None):
+    """
+    Pipeline fragment for one camera: appsrc `name` -> RTP (JPEG or H.264,
+    see CODEC) -> `sink`, plus the preview rendition -> `preview_sink` if given.
+    """
+    sink = relay_sink(name, sink)
+    src = f"appsrc name={name} caps=\"image/jpeg,framerate={caps_framerate}\" is-live=true block=true format=time ! "
+    # JPEG frames are split between full and preview streams here
+    tee = f"tee name={name}_t ! queue ! " if preview_sink else ""
+    preview = preview_branch(name, preview_sink) if preview_sink else ""
+    # resolution stage driven by QualityController (caps set in connect_adaptive)
+    scale = f"videoscale name={name}_scaler ! capsfilter name={name}_scale ! " if with_adaptive() else ""
+    if CODEC == "h264":
+        return src + tee + f"jpegparse ! jpegdec ! videoconvert ! {scale}video/x-raw,format=I420 ! {rtp_payloader(chk)} ! {sink} " + preview
+    if not JPEG_PASSTHROUGH or with_adaptive():
+        return src + tee + f"decodebin ! videoconvert ! {scale}video/x-raw,format=I420 ! jpegenc name={chk} ! {rtp_payloader(chk)} ! {sink} " + preview
+    # Frames go straight to the payloader; the ones it can't take are
+    # re-encoded by push_video first, on the same appsrc so PTS order holds
+    return src + tee + f"jpegparse name={chk} ! {rtp_payloader(chk)} ! {sink} " + preview
+
+def stereo_branch(cameras, sink):
+    """
+    appsrc vid_<name> of every camera -> compositor `stereo` -> one RTP
+    stream -> `sink`. The appsrcs are not live so the compositor always
+    waits for the frame of every camera before producing a packed frame.
+    Pad x offsets are set by connect_stereo() once the frame sizes are known.
+    """
+    sink = relay_sink("vid_stereo", sink)
+    enc = rtp_payloader("chk_stereo")
+    if CODEC != "h264":
+        enc = f"jpegenc name=chk_stereo ! {enc}"
+    desc = f"compositor name=stereo background=black ! videoconvert ! video/x-raw,format=I420 ! {enc} ! {sink} "
+    for i, cam in enumerate(cameras):
+        desc += (f"appsrc name=vid_{cam['name']} caps=\"image/jpeg,framerate={caps_framerate}\" block=true format=time ! "
+                 f"jpegparse ! jpegdec ! videoconvert ! stereo.sink_{i} ")
+    return desc
+
+def klv_branch(name, mux_pad="mux."):
+    """KLV appsrc of one camera, linked to a shared mpegtsmux pad."""
+    return (f"appsrc name=klv_{name} caps=\"meta/x-klv,parsed=true,framerate={caps_framerate}\" is-live=true block=true format=time ! "
+            f"queue ! {mux_pad} ")
+
+def build_ts_pipeline_desc(cameras, ts_sink):
+    """All cameras, video and KLV, in one MPEG-TS with fixed PIDs (ts_transport.stream_pids)."""
+    desc = f"mpegtsmux name=tsmux alignment=7 ! {ts_sink} "
+    for i, cam in enumerate(cameras):
+        vid_pid, klv_pid = stream_pids(i)
+        desc += (f"appsrc name=vid_{cam['name']} caps=\"meta/x-klv,parsed=true,framerate={caps_framerate}\" is-live=true block=true format=time ! "
+                 f"queue ! tsmux.sink_{vid_pid} ")
+        desc += klv_branch(cam['name'], f"tsmux.sink_{klv_pid}")
+    return desc
+
+def ts_uri():
+    return f"srt://{VIDEO_SRT_HOST}:{TS_SRT_PORT}?mode=listener"
+
+def connect_streamid(pipeline, cameras):
+    sink = pipeline.get_by_name("ts_srt")
+    if sink is None:
         return
-    with open(path, 'rb') as f:
-        data = f.read()
-    buf = Gst.Buffer.new_allocate(None, len(data), None)
-    buf.fill(0, data)
-    buf.pts = (idx - 1) * frame_duration
+    known = [cam['name'] for cam in cameras]
+
+    def on_caller_connecting(sink, addr, streamid):
+        names = parse_streamid(streamid)
+        unknown = [n for n in names if n not in known]
+        ok = not unknown and (bool(names) or not TS_REQUIRE_STREAMID)
+        peer = addr.get_address().to_string() if hasattr(addr, 'get_address') else addr
+        detail = f"unknown camera(s) {unknown}" if unknown else ("no streamid" if not names else ",".join(names))
+        print(f"[STREAMID] {peer} '{streamid or ''}': {'accepted' if ok else 'rejected'} ({detail})")
+        return ok
+
+    try:
+        sink.connect('caller-connecting', on_caller_connecting)
+    except TypeError:
+        print("[STREAMID] srtserversink has no caller-connecting signal (GStreamer < 1.22), every caller is accepted")
+
+def build_pipeline_desc(cameras, video_sink=None, klv_sink=None, ts_sink=None, preview_sink=None,
+                        video=True, klv=True):
+    """
+    video_sink(cam) -> sink description of one camera's RTP stream (default:
+    its SRT listener), klv_sink -> sink of the muxed KLV (default: TCP server),
+    ts_sink -> sink of the single TS in TRANSPORT = "ts" (default: SRT listener),
+    preview_sink(cam) -> sink of its preview stream (default: SRT listener on
+    preview_port). video / klv: RTP transport only, leave out the video
+    branches or the KLV mux (camera_workers.py splits them across processes).
+    """
+    sync = "false" if UNPACED or scheduled() or LIVE_INGEST else "true"
+    if TRANSPORT == "ts":
+        return build_ts_pipeline_desc(cameras, ts_sink or f"srtserversink name=ts_srt uri={ts_uri()} sync={sync}")
+    if video_sink is None and FANOUT > 1:
+        video_sink = lambda cam: fanout_sink(f"vid_{cam['name']}", subscriber_uris(cam), sync, FANOUT_QUEUE_BUFFERS)
+    video_sink = video_sink or (lambda cam: f"srtserversink name=vid_{cam['name']}_srt uri={srt_uri(cam)} sync={sync}")
+    klv_sink = klv_sink or f"tcpserversink name=klv_tcp host={TCP_HOST} port={TCP_PORT} sync={sync}"
+    if not video:
+        desc = ""
+    elif stereo_packed():
+        desc = stereo_branch(cameras, video_sink(cameras[0]))
+    else:
+        preview_sink = preview_sink or (lambda cam: f"srtserversink uri={srt_uri(cam, 'preview_port')} sync={sync}")
+        desc = "".join(video_branch(f"vid_{cam['name']}", f"chk_{cam['name']}", video_sink(cam),
+                                    preview_sink(cam) if with_preview() else None) for cam in cameras)
+    if klv:
+        # Metadata of all cameras in one TS, paced by PTS
+        desc += f"mpegtsmux name=mux ! {klv_sink} "
+        desc += "".join(klv_branch(cam['name']) for cam in cameras)
+    return desc
+
+def connect_camera(pipeline, cam, video=True, klv=True):
+    """Feeds the camera's appsrcs; video / klv as in build_pipeline_desc."""
+    name = cam['name']
+    if video:
+        start_reencoder()
+    vid = pipeline.get_by_name(f"vid_{name}")
+    meta = pipeline.get_by_name(f"klv_{name}")
+    on_need_data_meta = make_meta_callback(name)
+    # the pacers own the frame index: a frame that does not decode just leaves a gap
+    on_video, step_video = on_need_data_video, next_video
+    if telemetry is not None:
+        on_video = telemetry.timed(f"vid_{name}", on_video)
+        step_video = telemetry.timed(f"vid_{name}", step_video)
+        on_need_data_meta = telemetry.timed(f"klv_{name}", on_need_data_meta)
+    if PACING == "coupled":
+        if video:
+            pacer.add(f"vid_{name}", coupled(vid, video_indexes, name, lambda src: step_video(src, name) is not False))
+        if klv:
+            pacer.add(f"klv_{name}", coupled(meta, meta_indexes, name, lambda src: on_need_data_meta(src, 0)))
+    elif PACING == "feeder":
+        for src in (vid if video else None, meta if klv else None):
+            if src is not None:
+                src.set_property('max-bytes', FEED_MAX_BYTES)
+        feeders[name] = threading.Thread(target=feed_camera, name=f"feed_{name}", daemon=True,
+                                         args=(name, vid if video else None, meta if klv else None))
+    elif PACING == "scheduler":
+        if video:
+            pacer.add_stream(f"vid_{name}", lambda: step_video(vid, name) is not False,
+                             lambda: (video_indexes[name] - 1) * frame_duration)
+        if klv:
+            pacer.add_stream(f"klv_{name}", lambda: on_need_data_meta(meta, 0),
+                             lambda: (meta_indexes[name] - 1) * frame_duration)
+    else:
+        if video:
+            vid.connect('need-data', on_video, name)
+        if klv:
+            meta.connect('need-data', on_need_data_meta)
+    if not video:
+        return
+    if caching() or (RTP_FRAME_ID and TRANSPORT == "rtp" and not STEREO_PACK):
+        relays[name] = make_relay(pipeline, f"vid_{name}", name)
+        if with_preview():
+            relays[f"{name}_prev"] = make_relay(pipeline, f"vid_{name}_prev", name)
+
+def make_relay(pipeline, prefix, name):
+    appsink = pipeline.get_by_name(f"{prefix}_pay")
+    appsrc = pipeline.get_by_name(f"{prefix}_rtp")
+    if not caching():
+        return FrameIdRelay(appsink, appsrc, frame_ids)
+    # sinks do not sync in scheduler mode: the replay thread paces itself
+    pace = (lambda: run_clock.get('start')) if scheduled() and not UNPACED else None
+    return CachingRelay(appsink, appsrc, frame_ids if RTP_FRAME_ID else None, loops=LOOPS,
+                        pass_frames=len(playbacks[name].entries), frame_duration=frame_duration,
+                        pace=pace, name=prefix, max_bytes=PACKET_CACHE_MAX_BYTES)
+
+def connect_stereo(pipeline, cameras):
+    """Places each camera at its x offset in the packed frame (sizes from its first frame)."""
+    widths = []
+    for cam in cameras:
+        size = jpeg_size(read_frame(cam['name'], 1) or b"")
+        if size is None:
+            raise RuntimeError(f"no readable first frame for {cam['name']}")
+        widths.append(size[0])
+    if CODEC == "jpeg" and sum(widths) > MAX_DIMENSION:
+        raise RuntimeError(f"packed width {sum(widths)} exceeds the RTP/JPEG limit of {MAX_DIMENSION}px "
+                           f"({' + '.join(map(str, widths))}), set CODEC = \"h264\" for STEREO_PACK")
+    mix = pipeline.get_by_name("stereo")
+    for i, x in enumerate(x_offsets(widths)):
+        mix.get_static_pad(f"sink_{i}").set_property('xpos', x)
+    print(f"[STEREO] packed width {sum(widths)}: " + " ".join(f"{c['name']}={w}" for c, w in zip(cameras, widths)))
+    if RTP_FRAME_ID:
+        relays['stereo'] = FrameIdRelay(pipeline.get_by_name("vid_stereo_pay"),
+                                        pipeline.get_by_name("vid_stereo_rtp"), frame_ids)
+
+def connect_fanout(pipeline, cam):
+    name = cam['name']
+    subscribers = []
+    for k in range(FANOUT):
+        queue = pipeline.get_by_name(f"vid_{name}_q{k}")
+        if queue is None:
+            # custom video_sink, or a camera packed into another's stream
+            return
+        subscribers.append(SubscriberStats(queue, pipeline.get_by_name(f"vid_{name}_srt{k}"), f"{name}/{k}"))
+    fanouts[name] = subscribers
+
+def pop_live(pending, pts, default):
+    """
+    Entry of the frame with this PTS. Older entries go with it: their frames
+    were dropped on the way (leaky preview queue, skipped frame) and would
+    never be served.
+    """
+    with live_lock:
+        for p in [p for p in pending if p < pts]:
+            del pending[p]
+        return pending.pop(pts, default)
+
+def live_ids(name):
+    """ids_for_pts of a live camera: frame id = filename index; records the write-to-send latency."""
+    def ids_for_pts(pts):
+        t_event, index = pop_live(live_pending[name], pts, (None, 0))
+        if t_event is not None:
+            live_latency.record(name, time.monotonic() - t_event)
+        return index, index
+    return ids_for_pts
+
+def start_live(pipeline, cam):
+    """Pushes the frames of cam's image_dir as they are written (pipeline must be PLAYING)."""
+    name = cam['name']
+    vid = pipeline.get_by_name(f"vid_{name}")
+    klv = pipeline.get_by_name(f"klv_{name}")
+    start_reencoder()
+    tracked = RTP_FRAME_ID and TRANSPORT == "rtp"
+    video_indexes[name] = 1
+    meta_indexes[name] = 1
+    live_pending[name] = {}
+    live_preview_ids[name] = {}
+    # one track per camera: only the filename field is serialized per frame
+    track = KlvTrack([], SESSION_NAME, fields=KLV_FIELDS, clock_id=klv_clock_id)
+
+    def on_file(index, path, t_event):
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            print(f"[LIVE] {path} removed before it was read")
+            return
+        if LIVE_PTS == "index":
+            pts = max(index - live_first.setdefault('index', index), 0) * frame_duration
+        else:
+            pts = pipeline.get_clock().get_time() - pipeline.get_base_time()
+        if tracked:
+            with live_lock:
+                live_pending[name][pts] = (t_event, index)
+                if with_preview():
+                    live_preview_ids[name][pts] = (index, index)
+        if FRAME_STAMP:
+            data = stamped(vid, data, index, pts)
+        buf = make_video_buffer(data)
+        buf.pts = pts
+        buf.duration = frame_duration
+        push_video(vid, name, data, buf)
+        kbuf = Gst.Buffer.new_wrapped(track.packet_for(path, id=index, trig_id=index, pts=pts))
+        kbuf.pts = pts
+        kbuf.duration = frame_duration
+        klv.emit('push-buffer', kbuf)
+        video_indexes[name] += 1
+        meta_indexes[name] += 1
+
+    if tracked:
+        relays[name] = FrameIdRelay(pipeline.get_by_name(f"vid_{name}_pay"),
+                                    pipeline.get_by_name(f"vid_{name}_rtp"), live_ids(name))
+        if with_preview():
+            relays[f"{name}_prev"] = FrameIdRelay(pipeline.get_by_name(f"vid_{name}_prev_pay"),
+                                                  pipeline.get_by_name(f"vid_{name}_prev_rtp"),
+                                                  lambda pts: pop_live(live_preview_ids[name], pts, (0, 0)))
+    if telemetry is not None:
+        on_file = telemetry.timed(f"vid_{name}", on_file)
+    watchers[name] = DirWatcher(cam['image_dir'], PATTERN, on_file, name=f"live_{name}")
+    print(f"[LIVE] watching {cam['image_dir']} for {name}")
+
+def connect_adaptive(pipeline, cam):
+    name = cam['name']
+    sinks = [pipeline.get_by_name(f"vid_{name}_srt{k}") for k in range(FANOUT)] if FANOUT > 1 else []
+    sinks = [s for s in sinks + [pipeline.get_by_name(f"vid_{name}_srt")] if s is not None]
+    if not sinks:
+        print(f"[ADAPT] {name}: no srtserversink to monitor")
+        return
+    enc = pipeline.get_by_name(f"chk_{name}")
+    capsfilter = pipeline.get_by_name(f"vid_{name}_scale")
+    scaler = pipeline.get_by_name(f"vid_{name}_scaler")
+
+    def apply(quality, scale):
+        if CODEC == "h264":
+            enc.set_property('bitrate', max(1, H264_BITRATE_KBPS * quality // ADAPT_LADDER[0][0]))
+        else:
+            enc.set_property('quality', quality)
+        caps = "video/x-raw"
+        if scale < 1.0:
+            # source width from the caps into videoscale: the capsfilter's own
+            # sink pad already carries the scaled width, scales would compound
+            current = scaler.get_static_pad('sink').get_current_caps()
+            if current is not None:
+                width = current.get_structure(0).get_value('width')
+                caps = f"video/x-raw,width={max(8, int(width * scale) // 8 * 8)}"
+        capsfilter.set_property('caps', Gst.Caps.from_string(caps))
+
+    controllers[name] = QualityController(name, sinks, apply, ladder=ADAPT_LADDER)
+
+def step_controllers():
+    for c in controllers.values():
+        c.step()
+    return True
+
+def setup_cameras(cameras, video=True):
+    """Playback state of every camera; video=False: KLV only, no prefetch."""
+    global pacer
+    if PACING == "coupled":
+        pacer = FrameScheduler(frame_duration, spin=PACER_SPIN_S, report_interval=STATS_INTERVAL_S)
+    else:
+        pacer = Pacer(spin=PACER_SPIN_S, report_interval=STATS_INTERVAL_S)
+    for cam in cameras:
+        video_indexes[cam['name']] = 1
+        meta_indexes[cam['name']] = 1
+        load_manifest(cam)
+        if video and PREFETCH_DEPTH > 0 and not FRAME_ARCHIVE:
+            start_prefetch(cam['name'])
+
+def report_rate():
+    if 'start' not in run_clock or not video_indexes:
+        return
+    elapsed = time.monotonic() - run_clock['start']
+    frames = sum(video_indexes.values()) - len(video_indexes)
+    fps = frames / elapsed if elapsed > 0 else 0.0
+    print(f"[RATE] {frames} frames in {elapsed:.2f}s: {fps:.1f} fps total, "
+          f"{fps / len(video_indexes):.1f} fps/camera ({fps / len(video_indexes) / FPS:.2f}x real time)")
+
+def teardown():
+    global reencoder
+    if pacer is not None:
+        pacer.stop()
+        if scheduled():
+            pacer.report()
+    feeding.clear()
+    for thread in feeders.values():
+        if thread.is_alive():
+            thread.join(timeout=1.0)
+    if reencoder is not None:
+        reencoder.close()
+        reencoder = None
+    for w in watchers.values():
+        w.stop()
+    for r in relays.values():
+        if isinstance(r, CachingRelay):
+            r.stop()
+            r.report()
+    report_rate()
+    run_clock.clear()
+    for p in prefetchers.values():
+        p.stop()
+    for a in archives.values():
+        a.close()
+    report_stats()
+    if JPEG_PASSTHROUGH:
+        jpeg_stats.report()
+    for c in controllers.values():
+        print(f"[ADAPT] {c.name}: final level {c.level} {c.ladder[c.level]}, {c.changes} change(s)")
+    for state in (video_indexes, meta_indexes, prefetchers, archives, playbacks, klv_tracks, relays, fanouts, controllers,
+                  watchers, live_pending, live_preview_ids, live_first, feeders, jpeg_stats.counts):
+        state.clear()
+
+def meta_buffer(name, idx):
+    """KLV buffer of output frame idx, None at the end of playback."""
+    loc = playbacks[name].locate(idx - 1)
+    if loc is None:
+        return None
+    pts = (idx - 1) * frame_duration
+    frame_id, trig_id = frame_ids(pts)
+    buf = Gst.Buffer.new_wrapped(klv_tracks[name].packet(loc[0], id=frame_id, trig_id=trig_id, pts=pts))
+    buf.pts = pts
     buf.duration = frame_duration
-    appsrc.emit('push-buffer', buf)
-    video_indexes[image_dir] += 1
+    return buf
 
-def make_meta_callback(image_dir):
+def make_meta_callback(name):
     def on_need_data_meta(appsrc, length):
-        idx = meta_indexes[image_dir]
-        info = info_pb2.StreamInfo()
-        info.filename = os.path.join(image_dir, PATTERN % idx)
-        now = time.time()
-        ts = Timestamp(seconds=int(now), nanos=int((now - int(now)) * 1e9))
-        info.systemtime.CopyFrom(ts)
-        info.session_name = "Session Offline"
-        payload = info.SerializeToString()
-
-        frame = bytearray(_key) + struct.pack(">I", len(payload)) + payload
-        buf = Gst.Buffer.new_wrapped(frame)
-        buf.pts = (idx - 1) * frame_duration
-        buf.duration = frame_duration
+        buf = meta_buffer(name, meta_indexes[name])
+        if buf is None:
+            appsrc.emit('end-of-stream')
+            return False
         appsrc.emit('push-buffer', buf)
-        meta_indexes[image_dir] += 1
+        meta_indexes[name] += 1
+        return True
     return on_need_data_meta
 
 def on_message(bus, message, loop):
@@ -83,38 +970,42 @@ def on_message(bus, message, loop):
         loop.quit()
 
 def main():
-    # Build pipeline
-    pipeline_desc = (
-        # Video left
-        f"appsrc name=vid_left caps=\"image/jpeg,framerate={FPS}/1\" is-live=true block=true format=time ! "
-        "decodebin ! videoconvert ! video/x-raw,format=I420 ! jpegenc name=chk1 ! rtpjpegpay mtu=1316 ! "
-        f"srtserversink uri={VIDEO_SRT_URI_LEFT} "
-
-        # Video right
-        f"appsrc name=vid_right caps=\"image/jpeg,framerate={FPS}/1\" is-live=true block=true format=time ! "
-        "decodebin ! videoconvert ! video/x-raw,format=I420 ! jpegenc name=chk2 ! rtpjpegpay mtu=1316 ! "
-        f"srtserversink uri={VIDEO_SRT_URI_RIGHT} "
-
-        # Metadata left with pacing by PTS
-        f"appsrc name=klv_left caps=\"meta/x-klv,parsed=true,framerate={FPS}/1\" is-live=true block=true format=time ! "
-        "queue ! mpegtsmux name=mux ! "
-        f"tcpserversink host={TCP_HOST} port={TCP_PORT} sync=true "
-
-        # Metadata right
-        f"appsrc name=klv_right caps=\"meta/x-klv,parsed=true,framerate={FPS}/1\" is-live=true block=true format=time ! "
-        "queue ! mux."
-    )
+    global telemetry
+    cameras = assign_ports(CAMERAS)
+    if LIVE_INGEST and stereo_packed():
+        print("[ERROR] LIVE_INGEST cannot be combined with STEREO_PACK")
+        return
+    if FRAME_STAMP and caching():
+        print("[ERROR] FRAME_STAMP cannot be combined with PACKET_CACHE")
+        return
 
+    # Build pipeline
+    pipeline_desc = build_pipeline_desc(cameras)
     print("generator pipeline : ", pipeline_desc)
-
-
     pipeline = Gst.parse_launch(pipeline_desc)
+    if TELEMETRY_PATH:
+        telemetry = Telemetry(TELEMETRY_PATH, TELEMETRY_INTERVAL_S)
+        telemetry.watch_pipeline(pipeline)
+        telemetry.start()
 
-    # Connect callbacks
-    pipeline.get_by_name('vid_left').connect('need-data', on_need_data_video, IMAGE_DIR_LEFT)
-    pipeline.get_by_name('vid_right').connect('need-data', on_need_data_video, IMAGE_DIR_RIGHT)
-    pipeline.get_by_name('klv_left').connect('need-data', make_meta_callback(IMAGE_DIR_LEFT))
-    pipeline.get_by_name('klv_right').connect('need-data', make_meta_callback(IMAGE_DIR_RIGHT))
+    if not LIVE_INGEST:
+        setup_cameras(cameras)
+        for cam in cameras:
+            connect_camera(pipeline, cam)
+    if stereo_packed():
+        connect_stereo(pipeline, cameras)
+    if TRANSPORT == "ts":
+        connect_streamid(pipeline, cameras)
+    if FANOUT > 1 and TRANSPORT == "rtp":
+        for cam in cameras:
+            connect_fanout(pipeline, cam)
+    if with_adaptive():
+        for cam in cameras:
+            connect_adaptive(pipeline, cam)
+        GLib.timeout_add(ADAPT_INTERVAL_MS, step_controllers)
+    if prefetchers or fanouts or LIVE_INGEST:
+        GLib.timeout_add_seconds(STATS_INTERVAL_S, report_stats)
+    threading.Thread(target=read_commands, daemon=True).start()
 
     # Bus and loop
     loop = GLib.MainLoop()
@@ -122,8 +1013,34 @@ def main():
     bus.add_signal_watch()
     bus.connect('message', lambda b, m: on_message(b, m, loop))
 
+    if NET_CLOCK_PORT:
+        start_net_clock(pipeline)
     pipeline.set_state(Gst.State.PLAYING)
-    print(f"Streaming LEFT→{VIDEO_SRT_URI_LEFT}, RIGHT→{VIDEO_SRT_URI_RIGHT}, KLV→tcp://{TCP_HOST}:{TCP_PORT} @ {FPS} FPS")
+    run_clock['start'] = time.monotonic()
+    if LIVE_INGEST:
+        for cam in cameras:
+            start_live(pipeline, cam)
+    elif scheduled():
+        pacer.start()
+    elif PACING == "feeder":
+        start_feeders()
+    pace = "unpaced" if UNPACED and not scheduled() else f"{float(output_rate):g} FPS ({SPEED}x, {PACING} pacing)"
+    if TRANSPORT == "ts":
+        for i, cam in enumerate(cameras):
+            print(f"Streaming {cam['name']}: {cam['image_dir']} → PIDs 0x{stream_pids(i)[0]:x}/0x{stream_pids(i)[1]:x}")
+        print(f"TS→{ts_uri()} @ {pace}")
+    elif stereo_packed():
+        print(f"Streaming {'|'.join(c['name'] for c in cameras)} side by side → {', '.join(subscriber_uris(cameras[0]))}")
+        print(f"KLV→tcp://{TCP_HOST}:{TCP_PORT} @ {pace}")
+    else:
+        if FANOUT > 1:
+            print(f"[FANOUT] {FANOUT} subscribers per camera, one SRT listener each "
+                  f"(port + k * {FANOUT_PORT_STEP}), one caller per listener")
+        for cam in cameras:
+            print(f"Streaming {cam['name']}: {cam['image_dir']} → {', '.join(subscriber_uris(cam))}")
+            if with_preview():
+                print(f"Preview {cam['name']}: {PREVIEW_WIDTH}px q={PREVIEW_QUALITY} → {srt_uri(cam, 'preview_port')}")
+        print(f"KLV→tcp://{TCP_HOST}:{TCP_PORT} @ {pace}")
 
     try:
         loop.run()
@@ -131,6 +1048,9 @@ def main():
         print("Interrupted")
     finally:
         pipeline.set_state(Gst.State.NULL)
+        teardown()
+        if telemetry is not None:
+            telemetry.close()
 
 if __name__ == '__main__':
     main()
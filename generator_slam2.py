@@ -6,6 +6,10 @@ import info_pb2
 from google.protobuf.timestamp_pb2 import Timestamp
 import hashlib
 import struct
+from jpeg_passthrough import check_jpeg, PassthroughStats
+from jpeg_reencode import JpegReencoder
+from telemetry import Telemetry
+from pacer import FrameScheduler, DeferredSrc
 
 gi.require_version('Gst', '1.0')
 from gi.repository import Gst, GLib
@@ -28,36 +32,115 @@ VIDEO_SRT_URI_RIGHT = "srt://127.0.0.1:6021?mode=listener"
 TCP_HOST            = "127.0.0.1"
 TCP_PORT            = 7000
 
+# Send the dataset JPEGs as-is (jpegparse ! rtpjpegpay) and only re-encode
+# the frames rtpjpegpay cannot payload
+JPEG_PASSTHROUGH    = True
+
+# One pacer.FrameScheduler thread reads the left/right video and KLV buffers
+# of each frame, then pushes them back to back (sinks sync=false) instead of
+# four need-data callbacks; lateness and per-stream skew of the pushes
+# printed every 10 s and at the end
+COUPLED             = False
+
+# JSON-lines telemetry (telemetry.py): None = off, "-" = stdout, else a file
+TELEMETRY_PATH      = None
+TELEMETRY_INTERVAL_S = 1.0
+
 # Initialize GStreamer and indexes
 Gst.init(None)
 _key = hashlib.md5(b"StreamInfo").digest()
 frame_duration = Gst.SECOND // FPS
 video_indexes = {IMAGE_DIR_LEFT: 1, IMAGE_DIR_RIGHT: 1}
 meta_indexes  = {IMAGE_DIR_LEFT: 1, IMAGE_DIR_RIGHT: 1}
+jpeg_stats = PassthroughStats()
+reencoder = None   # JpegReencoder of the passthrough fallback, see start_reencoder
+telemetry = None
+scheduler = None
+SYNC = "false" if COUPLED else "true"
 
 # Store PTS values per frame index
 frame_pts = {}
 
-def on_need_data_video(appsrc, length, image_dir):
+def start_reencoder():
+    """Side pipeline of the passthrough fallback, started from main() before PLAYING."""
+    global reencoder
+    if JPEG_PASSTHROUGH and reencoder is None:
+        reencoder = JpegReencoder()
+
+def push_next_video(appsrc, image_dir):
+    """
+    Pushes frame video_indexes[image_dir] and moves on. False at the end of
+    the sequence, None if the frame does not decode (nothing pushed).
+    """
     idx = video_indexes[image_dir]
     path = os.path.join(image_dir, PATTERN % idx)
     if not os.path.exists(path):
         appsrc.emit('end-of-stream')
-        return
+        return False
     with open(path, 'rb') as f:
         data = f.read()
+    if reencoder is not None:
+        # passthrough mode: frames rtpjpegpay can't payload are re-encoded here,
+        # on the same appsrc so they keep their place in PTS order
+        ok, reason = check_jpeg(data)
+        jpeg_stats.record(image_dir, ok, reason)
+        if not ok:
+            data = reencoder.encode(data)
+        if data is None:
+            print(f"[JPEG] {path} does not decode, skipped")
+            video_indexes[image_dir] += 1
+            return None
     buf = Gst.Buffer.new_allocate(None, len(data), None)
     buf.fill(0, data)
     buf.pts = (idx - 1) * frame_duration
     buf.duration = frame_duration
     appsrc.emit('push-buffer', buf)
     video_indexes[image_dir] += 1
+    return True
+
+def on_need_data_video(appsrc, length, image_dir):
+    # need-data only comes back after a push: go on to the next frame that decodes
+    alive = push_next_video(appsrc, image_dir)
+    while alive is None:
+        alive = push_next_video(appsrc, image_dir)
+    return alive
+
+def video_branch(name, chk, sink):
+    """Pipeline fragment for one camera: appsrc `name` -> RTP/JPEG -> `sink`."""
+    src = f"appsrc name={name} caps=\"image/jpeg,framerate={FPS}/1\" is-live=true block=true format=time ! "
+    if not JPEG_PASSTHROUGH:
+        return src + f"decodebin ! videoconvert ! video/x-raw,format=I420 ! jpegenc name={chk} ! rtpjpegpay mtu=1316 ! {sink} "
+    # Frames go straight to the payloader; the ones it can't take are
+    # re-encoded by on_need_data_video before the push
+    return src + f"jpegparse name={chk} ! rtpjpegpay mtu=1316 ! {sink} "
+
+def coupled(appsrc, indexes, image_dir, emit):
+    """FrameScheduler preparer: emit(src) reads frame n on a DeferredSrc, pushed later by the scheduler."""
+    def prepare(n):
+        indexes[image_dir] = n
+        src = DeferredSrc(appsrc)
+        alive = emit(src)
+        return src.push, alive
+    return prepare
+
+def connect_video(pipeline, name, image_dir):
+    appsrc = pipeline.get_by_name(name)
+    if scheduler is not None:
+        # the scheduler owns the frame index: a frame that does not decode just leaves a gap
+        step = telemetry.timed(name, push_next_video) if telemetry else push_next_video
+        scheduler.add(name, coupled(appsrc, video_indexes, image_dir, lambda src: step(src, image_dir) is not False))
+    else:
+        callback = telemetry.timed(name, on_need_data_video) if telemetry else on_need_data_video
+        appsrc.connect('need-data', callback, image_dir)
 
 def make_meta_callback(image_dir):
     def on_need_data_meta(appsrc, length):
         idx = meta_indexes[image_dir]
         info = info_pb2.StreamInfo()
         info.filename = os.path.join(image_dir, PATTERN % idx)
+        if not os.path.exists(info.filename):
+            appsrc.emit('end-of-stream')
+            return False
         now = time.time()
         ts = Timestamp(seconds=int(now), nanos=int((now - int(now)) * 1e9))
         info.systemtime.CopyFrom(ts)
@@ -70,6 +153,7 @@ def make_meta_callback(image_dir):
         buf.duration = frame_duration
         appsrc.emit('push-buffer', buf)
         meta_indexes[image_dir] += 1
+        return True
     return on_need_data_meta
 
 def on_message(bus, message, loop):
@@ -83,22 +167,19 @@ def on_message(bus, message, loop):
         loop.quit()
 
 def main():
+    global telemetry, scheduler
     # Build pipeline
     pipeline_desc = (
         # Video left
-        f"appsrc name=vid_left caps=\"image/jpeg,framerate={FPS}/1\" is-live=true block=true format=time ! "
-        "decodebin ! videoconvert ! video/x-raw,format=I420 ! jpegenc name=chk1 ! rtpjpegpay mtu=1316 ! "
-        f"srtserversink latency=1000 max-lateness=10000000000 uri={VIDEO_SRT_URI_LEFT} "
+        video_branch("vid_left", "chk1", f"srtserversink latency=1000 max-lateness=10000000000 sync={SYNC} uri={VIDEO_SRT_URI_LEFT}") +
 
         # Video right
-        f"appsrc name=vid_right caps=\"image/jpeg,framerate={FPS}/1\" is-live=true block=true format=time ! "
-        "decodebin ! videoconvert ! video/x-raw,format=I420 ! jpegenc name=chk2 ! rtpjpegpay mtu=1316 ! "
-        f"srtserversink latency=1000 max-lateness=10000000000 uri={VIDEO_SRT_URI_RIGHT} "
+        video_branch("vid_right", "chk2", f"srtserversink latency=1000 max-lateness=10000000000 sync={SYNC} uri={VIDEO_SRT_URI_RIGHT}") +
 
         # Metadata left with pacing by PTS
         f"appsrc name=klv_left caps=\"meta/x-klv,parsed=true,framerate={FPS}/1\" is-live=true block=true format=time ! "
         "queue ! mpegtsmux name=mux ! "
-        f"tcpserversink host={TCP_HOST} port={TCP_PORT} sync=true "
+        f"tcpserversink host={TCP_HOST} port={TCP_PORT} sync={SYNC} "
 
         # Metadata right
         f"appsrc name=klv_right caps=\"meta/x-klv,parsed=true,framerate={FPS}/1\" is-live=true block=true format=time ! "
@@ -107,14 +188,29 @@ def main():
 
     print("generator pipeline :", pipeline_desc)
     pipeline = Gst.parse_launch(pipeline_desc)
+    if TELEMETRY_PATH:
+        telemetry = Telemetry(TELEMETRY_PATH, TELEMETRY_INTERVAL_S)
+        telemetry.watch_pipeline(pipeline)
+        telemetry.start()
+
+    if COUPLED:
+        scheduler = FrameScheduler(frame_duration, report_interval=10.0)
 
     # Connect callbacks for video streams
-    pipeline.get_by_name('vid_left').connect('need-data', on_need_data_video, IMAGE_DIR_LEFT)
-    pipeline.get_by_name('vid_right').connect('need-data', on_need_data_video, IMAGE_DIR_RIGHT)
+    start_reencoder()
+    connect_video(pipeline, 'vid_left', IMAGE_DIR_LEFT)
+    connect_video(pipeline, 'vid_right', IMAGE_DIR_RIGHT)
 
     # Connect callbacks for metadata streams
-    pipeline.get_by_name('klv_left').connect('need-data', make_meta_callback(IMAGE_DIR_LEFT))
-    pipeline.get_by_name('klv_right').connect('need-data', make_meta_callback(IMAGE_DIR_RIGHT))
+    for name, image_dir in (('klv_left', IMAGE_DIR_LEFT), ('klv_right', IMAGE_DIR_RIGHT)):
+        callback = make_meta_callback(image_dir)
+        if telemetry:
+            callback = telemetry.timed(name, callback)
+        appsrc = pipeline.get_by_name(name)
+        if scheduler is not None:
+            scheduler.add(name, coupled(appsrc, meta_indexes, image_dir, lambda src, cb=callback: cb(src, 0)))
+        else:
+            appsrc.connect('need-data', callback)
 
     # Helper to record and display 4 PTS per frame
     def pad_probe_callback(pad, info, name):
@@ -147,6 +243,8 @@ def main():
     bus.connect('message', lambda b, m: on_message(b, m, loop))
 
     pipeline.set_state(Gst.State.PLAYING)
+    if scheduler is not None:
+        scheduler.start()
     print(f"Streaming LEFT→{VIDEO_SRT_URI_LEFT}, RIGHT→{VIDEO_SRT_URI_RIGHT}, KLV→tcp://{TCP_HOST}:{TCP_PORT} @ {FPS} FPS")
 
     try:
@@ -154,7 +252,16 @@ def main():
     except KeyboardInterrupt:
         print("Interrupted")
     finally:
+        if scheduler is not None:
+            scheduler.stop()
+            scheduler.report()
         pipeline.set_state(Gst.State.NULL)
+        if reencoder is not None:
+            reencoder.close()
+        if JPEG_PASSTHROUGH:
+            jpeg_stats.report()
+        if telemetry:
+            telemetry.close()
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Checks whether a JPEG file can go straight into rtpjpegpay (RFC 2435)
+without being decoded and re-encoded, and counts how many frames took
+each path.
+"""
+import struct
+import sys
+from collections import Counter, defaultdict
+
+# SOFn markers (C4 = DHT, C8 = JPG extension, CC = DAC are not SOF)
+_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7,
+                0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+# Standalone markers without a length field
+_STANDALONE = {0x01} | set(range(0xD0, 0xD9))
+
+# RFC 2435 encodes width/height in units of 8 pixels on one byte
+MAX_DIMENSION = 2040
+
+
+def check_jpeg(data):
+    """
+    Returns (ok, reason). ok is True when the JPEG is baseline, 8-bit,
+    YUV 4:2:2 or 4:2:0 with shared chroma tables, i.e. something
+    rtpjpegpay can payload as RTP/JPEG type 0/1 and rtpjpegdepay can rebuild.
+    """
+    n = len(data)
+    if n < 4 or data[0] != 0xFF or data[1] != 0xD8:
+        return False, "no SOI"
+
+    i = 2
+    sof = None
+    while i + 4 <= n:
+        if data[i] != 0xFF:
+            return False, "corrupt marker"
+        marker = data[i + 1]
+        if marker == 0xFF:  # fill byte
+            i += 1
+            continue
+        if marker in _STANDALONE:
+            i += 2
+            continue
+        seglen = struct.unpack_from(">H", data, i + 2)[0]
+        seg = data[i + 4:i + 2 + seglen]
+        if len(seg) != seglen - 2:
+            return False, "truncated segment"
+
+        if marker == 0xDA:  # SOS: headers are over
+            break
+        if marker in _SOF_MARKERS:
+            if marker != 0xC0:
+                return False, f"not baseline (SOF{marker - 0xC0})"
+            sof = seg
+        elif marker == 0xDB:  # DQT: only 8-bit tables fit in RTP/JPEG
+            j = 0
+            while j < len(seg):
+                if seg[j] >> 4:
+                    return False, "16-bit quant table"
+                j += 65
+        i += 2 + seglen
+    else:
+        return False, "no SOS"
+
+    if sof is None:
+        return False, "no SOF"
+    precision, height, width, ncomp = struct.unpack_from(">BHHB", sof, 0)
+    if precision != 8:
+        return False, f"{precision}-bit samples"
+    if width > MAX_DIMENSION or height > MAX_DIMENSION:
+        return False, f"{width}x{height} too large"
+    if ncomp != 3:
+        return False, f"{ncomp} component(s)"
+    comps = [sof[6 + 3 * c:9 + 3 * c] for c in range(3)]
+    if comps[0][1] not in (0x21, 0x22):
+        return False, "unsupported luma sampling"
+    if comps[1][1] != 0x11 or comps[2][1] != 0x11:
+        return False, "unsupported chroma sampling"
+    if comps[1][2] != comps[2][2]:
+        return False, "chroma quant tables differ"
+    return True, None
+
+
+def jpeg_size(data):
+    """(width, height) from the SOF segment, None if there is none before SOS."""
+    i, n = 2, len(data)
+    while i + 4 <= n and data[i] == 0xFF:
+        marker = data[i + 1]
+        if marker == 0xFF:
+            i += 1
+            continue
+        if marker in _STANDALONE:
+            i += 2
+            continue
+        if marker == 0xDA:
+            break
+        if marker in _SOF_MARKERS and i + 9 <= n:
+            height, width = struct.unpack_from(">HH", data, i + 5)
+            return width, height
+        i += 2 + struct.unpack_from(">H", data, i + 2)[0]
+    return None
+
+
+class PassthroughStats:
+    """Per-stream count of passthrough vs re-encoded frames."""
+
+    def __init__(self):
+        self.counts = defaultdict(lambda: {'passthrough': 0, 'reencoded': 0})
+        self.reasons = Counter()
+
+    def record(self, stream, ok, reason=None):
+        if ok:
+            self.counts[stream]['passthrough'] += 1
+        else:
+            self.counts[stream]['reencoded'] += 1
+            self.reasons[reason] += 1
+
+    def report(self):
+        for stream, c in self.counts.items():
+            total = c['passthrough'] + c['reencoded']
+            print(f"[JPEG] {stream}: passthrough={c['passthrough']} reencoded={c['reencoded']} total={total}")
+        for reason, count in self.reasons.most_common():
+            print(f"[JPEG]   re-encode reason '{reason}': {count}")
+
+
+if __name__ == '__main__':
+    # Usage: python jpeg_passthrough.py img1.jpg img2.jpg ...
+    stats = PassthroughStats()
+    for path in sys.argv[1:]:
+        with open(path, 'rb') as f:
+            ok, reason = check_jpeg(f.read())
+        stats.record('files', ok, reason)
+        if not ok:
+            print(f"{path}: {reason}")
+    stats.report()
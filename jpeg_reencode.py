@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+Synchronous re-encode of the JPEGs check_jpeg() rejects, in a small side
+pipeline (jpegdec ! jpegenc). The caller gets the baseline 4:2:0 JPEG back
+and pushes it on the same appsrc as the passthrough frames. PTS order is
+kept without a second appsrc and a funnel downstream.
+"""
+import threading
+
+import gi
+gi.require_version('Gst', '1.0')
+from gi.repository import Gst
+
+
+class JpegReencoder:
+    def __init__(self, quality=85, timeout=Gst.SECOND):
+        self.quality = quality
+        self.timeout = timeout
+        self.failed = 0
+        self._lock = threading.Lock()
+        self._start()
+
+    def _start(self):
+        self.pipeline = Gst.parse_launch(
+            "appsrc name=in caps=image/jpeg format=time ! jpegdec ! videoconvert ! "
+            f"video/x-raw,format=I420 ! jpegenc quality={self.quality} ! appsink name=out sync=false")
+        self.src = self.pipeline.get_by_name('in')
+        self.sink = self.pipeline.get_by_name('out')
+        self.pipeline.set_state(Gst.State.PLAYING)
+
+    def encode(self, data):
+        """Re-encoded JPEG bytes, None if the frame does not decode."""
+        with self._lock:
+            self.src.emit('push-buffer', Gst.Buffer.new_wrapped(bytes(data)))
+            sample = self.sink.emit('try-pull-sample', self.timeout)
+            if sample is None:
+                # a frame jpegdec cannot decode errors the side pipeline out: start over
+                self.failed += 1
+                self.pipeline.set_state(Gst.State.NULL)
+                self._start()
+                return None
+        buf = sample.get_buffer()
+        return buf.extract_dup(0, buf.get_size())
+
+    def close(self):
+        self.pipeline.set_state(Gst.State.NULL)
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Pre-serialized KLV track: the StreamInfo packets of a whole sequence
+(md5 key + length header + payload) built once in one contiguous buffer.
+Only the time and sequence fields are patched per frame.
+
+Patched fields are written as fixed-width (zero-padded) varints so they
+can be overwritten in place; protobuf parsers accept non-minimal varints.
+"""
+import hashlib
+import struct
+import time
+
+import info_pb2
+
+KEY = hashlib.md5(b"StreamInfo").digest()
+
+_SECONDS_WIDTH = 6   # 42 bits
+_NANOS_WIDTH = 5     # 35 bits
+# StreamInfo fields that can be patched per frame: name -> (field number, width)
+PATCH_FIELDS = {
+    'id': (4, 5),
+    'trig_id': (5, 5),
+    'pts': (15, 10),
+}
+
+
+def _tag(field, wire_type):
+    return bytes([(field << 3) | wire_type])
+
+
+def _padded_varint(value, width):
+    out = bytearray(width)
+    put_varint(out, 0, value, width)
+    return out
+
+
+def put_varint(buf, offset, value, width):
+    """Writes non-negative `value` as a varint of exactly `width` bytes."""
+    for k in range(width - 1):
+        buf[offset + k] = (value & 0x7F) | 0x80
+        value >>= 7
+    buf[offset + width - 1] = value & 0x7F
+
+
+class KlvTrack:
+    """
+    fields: names from PATCH_FIELDS reserved in every packet and set by
+    packet(..., name=value). clock_id: constant StreamInfo.clock_id (see
+    net_clock.py), "" to leave it out.
+    """
+
+    def __init__(self, filenames, session_name, key=KEY, fields=(), clock_id=""):
+        header = info_pb2.StreamInfo(session_name=session_name, clock_id=clock_id).SerializeToString()
+        # systemtime (field 3) as a nested Timestamp with fixed-width fields
+        ts_body = (_tag(1, 0) + _padded_varint(0, _SECONDS_WIDTH) +
+                   _tag(2, 0) + _padded_varint(0, _NANOS_WIDTH))
+        ts_field = _tag(3, 2) + bytes([len(ts_body)]) + ts_body
+        self._sec_skip = len(_tag(3, 2)) + 1 + len(_tag(1, 0))
+        self._nanos_skip = self._sec_skip + _SECONDS_WIDTH + len(_tag(2, 0))
+        # patched scalar fields follow the systemtime field: name -> (offset from it, width)
+        patch = bytearray()
+        self._fields = {}
+        for name in fields:
+            number, width = PATCH_FIELDS[name]
+            patch += _tag(number, 0)
+            self._fields[name] = (len(ts_field) + len(patch), width)
+            patch += _padded_varint(0, width)
+        ts_field += patch
+        self._key = key
+        self._header = header
+        self._ts_field = bytes(ts_field)
+
+        data = bytearray()
+        self.offsets = []    # (packet start, packet end, systemtime field start)
+        for name in filenames:
+            start = len(data)
+            packet, ts_at = self._layout(name)
+            data += packet
+            self.offsets.append((start, len(data), start + ts_at))
+        self.data = data
+
+    def _layout(self, filename):
+        """(unpatched packet bytes, offset of its systemtime field) for `filename`."""
+        payload_head = info_pb2.StreamInfo(filename=filename).SerializeToString() + self._header
+        head = self._key + struct.pack(">I", len(payload_head) + len(self._ts_field)) + payload_head
+        return head + self._ts_field, len(head)
+
+    def _patch(self, data, ts_at, now_ns, values):
+        if now_ns is None:
+            now_ns = time.time_ns()
+        seconds, nanos = divmod(now_ns, 1_000_000_000)
+        put_varint(data, ts_at + self._sec_skip, seconds, _SECONDS_WIDTH)
+        put_varint(data, ts_at + self._nanos_skip, nanos, _NANOS_WIDTH)
+        for name, value in values.items():
+            offset, width = self._fields[name]
+            put_varint(data, ts_at + offset, value, width)
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def nbytes(self):
+        return len(self.data)
+
+    def packet(self, i, now_ns=None, **values):
+        """
+        KLV bytes of frame i with systemtime set to now_ns (default:
+        time.time_ns()) and the patch fields given as keywords.
+        """
+        start, end, ts_at = self.offsets[i]
+        self._patch(self.data, ts_at, now_ns, values)
+        return bytes(self.data[start:end])
+
+    def packet_for(self, filename, now_ns=None, **values):
+        """
+        packet() for a file outside the track (live ingest): same header and
+        patch fields, only the filename field is serialized per call.
+        """
+        data, ts_at = self._layout(filename)
+        data = bytearray(data)
+        self._patch(data, ts_at, now_ns, values)
+        return bytes(data)
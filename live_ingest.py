@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Live ingest (LIVE_INGEST in generator_slam.py): inotify watch of an image
+directory, through ctypes so nothing beyond libc is needed. A frame is
+handed over when its writer closes it (IN_CLOSE_WRITE) or when it is
+renamed into the directory (IN_MOVED_TO, write-then-rename capture
+software). No polling of the directory.
+
+    python live_ingest.py /path/imgs_left_numbered --pattern img%05d.jpg
+"""
+import argparse
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import threading
+import time
+
+from manifest import pattern_regex
+
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_Q_OVERFLOW = 0x00004000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+_EVENT = struct.Struct("iIII")   # wd, mask, cookie, len
+
+_libc = ctypes.CDLL(ctypes.util.find_library('c') or "libc.so.6", use_errno=True)
+
+
+class DirWatcher:
+    """
+    Calls on_file(index, path, t_event) from its own thread for every file
+    matching `pattern` that is completed in `image_dir`; t_event is the
+    time.monotonic() at which the event was read.
+    """
+
+    def __init__(self, image_dir, pattern, on_file, name="watch"):
+        self.image_dir = image_dir
+        self.regex = pattern_regex(pattern)
+        self.on_file = on_file
+        self.overflows = 0
+        self.fd = _libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        wd = _libc.inotify_add_watch(self.fd, os.fsencode(image_dir), IN_CLOSE_WRITE | IN_MOVED_TO)
+        if wd < 0:
+            err = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(err, f"inotify_add_watch failed on {image_dir}")
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        poller = select.poll()
+        poller.register(self.fd, select.POLLIN)
+        while self._running:
+            # the timeout only bounds how long stop() waits
+            if not poller.poll(200):
+                continue
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                continue
+            t_event = time.monotonic()
+            off = 0
+            while off + _EVENT.size <= len(data):
+                wd, mask, cookie, length = _EVENT.unpack_from(data, off)
+                name = data[off + _EVENT.size:off + _EVENT.size + length].rstrip(b"\0")
+                off += _EVENT.size + length
+                if mask & IN_Q_OVERFLOW:
+                    self.overflows += 1
+                    print(f"[LIVE] {self.image_dir}: inotify queue overflow, events lost")
+                    continue
+                m = self.regex.match(os.fsdecode(name))
+                if m:
+                    self.on_file(int(m.group(1)), os.path.join(self.image_dir, os.fsdecode(name)), t_event)
+
+    def stop(self):
+        self._running = False
+        self._thread.join(timeout=1.0)
+        os.close(self.fd)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('image_dir')
+    parser.add_argument('--pattern', default="img%05d.jpg")
+    args = parser.parse_args()
+    w = DirWatcher(args.image_dir, args.pattern,
+                   lambda idx, path, t: print(f"[LIVE] {idx} {path}"))
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        w.stop()
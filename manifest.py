@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Dataset manifest: the frames of an image directory, scanned once at
+startup (natural sort, index gaps, file sizes), and a Playback cursor over
+it with start/end frame, loop count and seek.
+
+    python manifest.py /path/imgs_left_numbered --pattern img%05d.jpg
+"""
+import argparse
+import bisect
+import os
+import re
+import threading
+from collections import namedtuple
+
+Entry = namedtuple('Entry', 'index path size')
+
+
+def natural_sort_key(s: str):
+    """Sort key splitting digits from text so img2 < img10."""
+    return [int(text) if text.isdigit() else text.lower()
+            for text in re.split(r'(\d+)', s)]
+
+
+def pattern_regex(pattern):
+    """'img%05d.jpg' -> regex capturing the frame index."""
+    parts = re.split(r'%0?\d*d', pattern)
+    if len(parts) != 2:
+        raise ValueError(f"pattern must contain exactly one %d field: {pattern}")
+    return re.compile(re.escape(parts[0]) + r'(\d+)' + re.escape(parts[1]) + '$')
+
+
+class DatasetManifest:
+    def __init__(self, image_dir, entries):
+        self.image_dir = image_dir
+        self.entries = entries
+        self.indexes = [e.index for e in entries]
+        self.gaps = [(a.index + 1, b.index - 1) for a, b in zip(entries, entries[1:])
+                     if b.index != a.index + 1]
+
+    @classmethod
+    def scan(cls, image_dir, pattern):
+        regex = pattern_regex(pattern)
+        found = []
+        with os.scandir(image_dir) as it:
+            for de in it:
+                m = regex.match(de.name)
+                if m and de.is_file():
+                    found.append((de.name, int(m.group(1)), de.stat().st_size))
+        found.sort(key=lambda f: natural_sort_key(f[0]))
+        return cls(image_dir, [Entry(idx, os.path.join(image_dir, name), size) for name, idx, size in found])
+
+    @classmethod
+    def from_archive(cls, archive, image_dir, pattern):
+        """Manifest of a FrameArchive (contiguous indexes, sizes from its index)."""
+        return cls(image_dir, [Entry(archive.first + i, os.path.join(image_dir, pattern % (archive.first + i)), length)
+                               for i, (_, length) in enumerate(archive.entries)])
+
+    def __len__(self):
+        return len(self.entries)
+
+    def position(self, index):
+        """Position of the first entry with entry.index >= index."""
+        return bisect.bisect_left(self.indexes, index)
+
+    def total_bytes(self):
+        return sum(e.size for e in self.entries)
+
+    def report(self):
+        if not self.entries:
+            print(f"[MANIFEST] {self.image_dir}: empty")
+            return
+        print(f"[MANIFEST] {self.image_dir}: {len(self)} frames "
+              f"{self.entries[0].index}..{self.entries[-1].index}, {self.total_bytes()} bytes, {len(self.gaps)} gap(s)")
+        for a, b in self.gaps[:10]:
+            print(f"[MANIFEST]   missing {a}" + (f"..{b}" if b != a else ""))
+        if len(self.gaps) > 10:
+            print(f"[MANIFEST]   ... {len(self.gaps) - 10} more")
+
+
+class Playback:
+    """
+    Maps an output sequence number n (0, 1, 2, ... one per emitted frame,
+    PTS = n * frame_duration) to a manifest entry, for frames start..end
+    (dataset indexes, inclusive) played `loops` times (0 = forever).
+
+    The mapping is deterministic so the video and KLV of one dir can be
+    driven by separate callbacks: seek(index, at) only changes the entries
+    of n >= at, both streams switch on the same frame.
+    """
+
+    def __init__(self, manifest, start=None, end=None, loops=1):
+        lo = manifest.position(start) if start is not None else 0
+        hi = manifest.position(end + 1) if end is not None else len(manifest)
+        self.entries = manifest.entries[lo:hi]
+        self.indexes = manifest.indexes[lo:hi]
+        self.loops = loops
+        self._seg_n = [0]     # output n where each segment starts
+        self._seg_pos = [0]   # position in the looped sequence at that n
+        self._lock = threading.Lock()
+
+    def _pos(self, n):
+        s = bisect.bisect_right(self._seg_n, n) - 1
+        return self._seg_pos[s] + (n - self._seg_n[s])
+
+    def locate(self, n):
+        """(position in self.entries, entry) for output frame n, or None once all loops are played."""
+        if not self.entries:
+            return None
+        with self._lock:
+            pos = self._pos(n)
+        if self.loops and pos >= self.loops * len(self.entries):
+            return None
+        i = pos % len(self.entries)
+        return i, self.entries[i]
+
+    def entry_at(self, n):
+        """Entry for output frame n, or None once all loops are played."""
+        loc = self.locate(n)
+        return loc[1] if loc else None
+
+    def seek(self, index, at):
+        """From output frame `at` on, play from dataset index `index` (same loop)."""
+        if not self.entries:
+            return
+        i = min(bisect.bisect_left(self.indexes, index), len(self.entries) - 1)
+        with self._lock:
+            # drop segments that started at or after `at`, they are superseded
+            while len(self._seg_n) > 1 and self._seg_n[-1] >= at:
+                self._seg_n.pop()
+                self._seg_pos.pop()
+            loop = self._pos(at) // len(self.entries)
+            self._seg_n.append(at)
+            self._seg_pos.append(loop * len(self.entries) + i)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Scan an image dir and print its manifest summary")
+    parser.add_argument('image_dirs', nargs='+')
+    parser.add_argument('--pattern', default="img%05d.jpg")
+    args = parser.parse_args()
+    for d in args.image_dirs:
+        DatasetManifest.scan(d, args.pattern).report()
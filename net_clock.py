@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Network clock shared by the generator and the sync clients.
+
+The generator publishes its pipeline clock with GstNetTimeProvider and runs
+with a fixed base time. Both are advertised in every KLV packet as
+StreamInfo.clock_id = "host:port/base_time". A client reads the first KLV,
+slaves a GstNetClientClock to the provider and uses the same base time, so
+running times are comparable across processes.
+
+Localhost check (offset of the slaved clock against the local system
+clock, i.e. the residual error when both ends share one machine):
+
+    python net_clock.py serve --port 8555
+    python net_clock.py check --host 127.0.0.1 --port 8555
+"""
+import argparse
+import struct
+import time
+
+import gi
+gi.require_version('Gst', '1.0')
+gi.require_version('GstNet', '1.0')
+from gi.repository import Gst, GstNet, GLib
+
+import info_pb2
+
+
+def format_clock_id(host, port, base_time):
+    return f"{host}:{port}/{base_time}"
+
+
+def parse_clock_id(clock_id):
+    """(host, port, base_time) from a StreamInfo.clock_id, None if it is not one."""
+    try:
+        addr, base = clock_id.rsplit("/", 1)
+        host, port = addr.rsplit(":", 1)
+        return host, int(port), int(base)
+    except ValueError:
+        return None
+
+
+def provide(pipeline, port, address=None, base_time=None):
+    """
+    Serves the system clock on `port` and makes `pipeline` run on it with a
+    fixed base time (default: now). Returns (provider, base_time); keep the
+    provider alive.
+    """
+    clock = Gst.SystemClock.obtain()
+    provider = GstNet.NetTimeProvider.new(clock, address, port)
+    pipeline.use_clock(clock)
+    # start_time NONE: PLAYING keeps our base time instead of picking its own
+    pipeline.set_start_time(Gst.CLOCK_TIME_NONE)
+    if base_time is None:
+        base_time = clock.get_time()
+    pipeline.set_base_time(base_time)
+    return provider, base_time
+
+
+def slave(host, port, timeout=10.0):
+    """GstNetClientClock synced to host:port; logs how long it took to converge."""
+    clock = GstNet.NetClientClock.new("net_clock", host, port, 0)
+    t0 = time.monotonic()
+    synced = clock.wait_for_sync(int(timeout * Gst.SECOND))
+    elapsed = time.monotonic() - t0
+    if synced:
+        print(f"[CLOCK] synced to {host}:{port} in {elapsed:.3f}s, offset vs local clock {offset_ms(clock):+.3f}ms")
+    else:
+        print(f"[CLOCK] not synced to {host}:{port} after {elapsed:.1f}s, running unsynced")
+    return clock
+
+
+def use(pipelines, clock, base_time):
+    for p in pipelines:
+        p.use_clock(clock)
+        p.set_start_time(Gst.CLOCK_TIME_NONE)
+        p.set_base_time(base_time)
+
+
+def offset_ms(clock):
+    """Slaved clock minus local system clock (ms); the residual error on localhost."""
+    return (clock.get_time() - Gst.SystemClock.obtain().get_time()) / 1e6
+
+
+def log_offset(clock, interval_s=5):
+    """Periodic [CLOCK] offset log from the GLib main loop."""
+    def tick():
+        print(f"[CLOCK] offset vs local clock {offset_ms(clock):+.3f}ms synced={clock.is_synced()}")
+        return True
+    GLib.timeout_add_seconds(interval_s, tick)
+
+
+def read_clock_id(tcp_host, tcp_port, timeout=10.0):
+    """clock_id of the first KLV packet served on tcp_host:tcp_port, None on timeout."""
+    pipe = Gst.parse_launch(
+        f"tcpclientsrc host={tcp_host} port={tcp_port} ! tsdemux ! meta/x-klv ! "
+        "appsink name=klv sync=false max-buffers=1 drop=true")
+    pipe.set_state(Gst.State.PLAYING)
+    clock_id = None
+    deadline = time.monotonic() + timeout
+    try:
+        while clock_id is None and time.monotonic() < deadline:
+            sample = pipe.get_by_name('klv').emit('try-pull-sample', Gst.SECOND // 2)
+            if sample is None:
+                continue
+            buf = sample.get_buffer()
+            data = buf.extract_dup(0, buf.get_size())
+            if len(data) < 20:
+                continue
+            msg = info_pb2.StreamInfo()
+            try:
+                msg.ParseFromString(data[20:20 + struct.unpack('>I', data[16:20])[0]])
+            except Exception:
+                continue
+            clock_id = msg.clock_id or None
+            if clock_id is None:
+                print("[CLOCK] KLV carries no clock_id (generator without NET_CLOCK_PORT)")
+                break
+    finally:
+        pipe.set_state(Gst.State.NULL)
+    return clock_id
+
+
+def slave_from_klv(tcp_host, tcp_port, timeout=10.0):
+    """(clock, base_time) advertised by the generator's KLV, or (None, None)."""
+    clock_id = read_clock_id(tcp_host, tcp_port, timeout)
+    parsed = parse_clock_id(clock_id) if clock_id else None
+    if parsed is None:
+        return None, None
+    host, port, base_time = parsed
+    print(f"[CLOCK] generator clock {host}:{port}, base time {base_time}")
+    return slave(host, port, timeout), base_time
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('mode', choices=['serve', 'check'])
+    parser.add_argument('--host', default="127.0.0.1")
+    parser.add_argument('--port', type=int, default=8555)
+    parser.add_argument('--interval', type=int, default=1)
+    args = parser.parse_args()
+    Gst.init(None)
+    loop = GLib.MainLoop()
+    if args.mode == 'serve':
+        provider = GstNet.NetTimeProvider.new(Gst.SystemClock.obtain(), None, args.port)
+        print(f"[CLOCK] serving system clock on port {args.port}")
+    else:
+        net = slave(args.host, args.port)
+        log_offset(net, args.interval)
+    try:
+        loop.run()
+    except KeyboardInterrupt:
+        pass
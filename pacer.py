@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Pacing scheduler for the generators: one thread releases the buffers of
+every stream at their target time on the monotonic clock, instead of
+relying on appsrc need-data and sink clock sync, and measures how late
+each emission actually was. FrameScheduler goes one step further and owns
+the frame index: all streams' buffers of a frame are pushed back to back.
+"""
+import heapq
+import threading
+import time
+from collections import defaultdict
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    k = min(len(sorted_values) - 1, int(round(q * (len(sorted_values) - 1))))
+    return sorted_values[k]
+
+
+class JitterStats:
+    """Emit error (actual - target, seconds) per stream over a reporting window."""
+
+    def __init__(self, tag="JITTER"):
+        self.tag = tag
+        self.window = defaultdict(list)
+        self.total = defaultdict(int)
+
+    def record(self, stream, error):
+        self.window[stream].append(error)
+        self.total[stream] += 1
+
+    def summary(self):
+        """{stream: (count, p50, p99, max)} in milliseconds for the current window."""
+        out = {}
+        for stream, errors in self.window.items():
+            errors = sorted(errors)
+            out[stream] = (len(errors), 1e3 * percentile(errors, 0.5),
+                           1e3 * percentile(errors, 0.99), 1e3 * errors[-1] if errors else 0.0)
+        return out
+
+    def report(self, reset=True):
+        for stream, (count, p50, p99, mx) in sorted(self.summary().items()):
+            print(f"[{self.tag}] {stream}: n={count} p50={p50:.3f}ms p99={p99:.3f}ms max={mx:.3f}ms")
+        if reset:
+            self.window.clear()
+
+
+class Pacer:
+    """
+    add_stream(name, emit, next_pts): emit() pushes one buffer and returns
+    False once the stream is over; next_pts() is the PTS (ns) of the buffer
+    the next emit() will push. The stream's buffer with PTS p is released
+    at start + p (monotonic). The last `spin` seconds before a target are
+    busy-waited, sleep() alone is too coarse.
+    """
+
+    def __init__(self, spin=0.0005, report_interval=10.0, on_done=None):
+        self.spin = spin
+        self.report_interval = report_interval
+        self.on_done = on_done
+        self.stats = JitterStats()
+        self._streams = []
+        self._running = False
+        self._thread = None
+        self._start = None
+
+    def add_stream(self, name, emit, next_pts):
+        self._streams.append((name, emit, next_pts))
+
+    def start(self, at=None):
+        """at: shared time.monotonic() of PTS 0 (default: now)."""
+        self._start = at
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="pacer", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._running = False
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+
+    def _wait_until(self, target):
+        while self._running:
+            left = target - time.monotonic()
+            if left <= 0:
+                return
+            if left > self.spin:
+                time.sleep(left - self.spin)
+
+    def _run(self):
+        start = time.monotonic() if self._start is None else self._start
+        next_report = time.monotonic() + self.report_interval
+        heap = [(start + next_pts() / 1e9, i) for i, (_, _, next_pts) in enumerate(self._streams)]
+        heapq.heapify(heap)
+        while self._running and heap:
+            target, i = heapq.heappop(heap)
+            name, emit, next_pts = self._streams[i]
+            self._wait_until(target)
+            if not self._running:
+                break
+            alive = emit()
+            self.stats.record(name, time.monotonic() - target)
+            if alive:
+                heapq.heappush(heap, (start + next_pts() / 1e9, i))
+            if self.report_interval and time.monotonic() >= next_report:
+                self.report()
+                next_report += self.report_interval
+        if self.on_done is not None:
+            self.on_done()
+
+    def report(self):
+        self.stats.report()
+
+
+class DeferredSrc:
+    """
+    Stands in for an appsrc while a frame is prepared: emit() calls are
+    recorded (everything else goes to the real appsrc) and push() replays
+    them on it, so need-data style callbacks can build a frame ahead of
+    its push.
+    """
+
+    def __init__(self, appsrc):
+        self._appsrc = appsrc
+        self._emits = []
+
+    def __getattr__(self, attr):
+        return getattr(self._appsrc, attr)
+
+    def emit(self, signal, *args):
+        self._emits.append((signal, args))
+        return 0  # Gst.FlowReturn.OK
+
+    def push(self):
+        for signal, args in self._emits:
+            self._appsrc.emit(signal, *args)
+
+
+class FrameScheduler(Pacer):
+    """
+    Owns the output frame index. Frame n (1-based) is due at
+    start + (n - 1) * frame_duration (monotonic). Every stream registered
+    with add(name, prepare) gets prepare(n) -> (push, alive): prepare
+    builds the stream's buffer of frame n (file reads, encoding) and
+    returns push(), which only sends it, and alive, False once the stream
+    is over. At the due time all streams are prepared first, then pushed
+    back to back in registration order. Lateness of the first push is
+    recorded per frame (stats, "frame"). The skew of the pushes is recorded
+    too (skew): per stream, its push completion after the first push
+    started; "frame", the whole spread.
+    """
+
+    def __init__(self, frame_duration, spin=0.0005, report_interval=10.0, on_done=None):
+        super().__init__(spin, report_interval, on_done)
+        self.frame_duration = frame_duration
+        self.skew = JitterStats(tag="SKEW")
+
+    def add(self, name, prepare):
+        self._streams.append((name, prepare))
+
+    def _run(self):
+        start = time.monotonic() if self._start is None else self._start
+        next_report = time.monotonic() + self.report_interval
+        active = list(self._streams)
+        n = 1
+        while self._running and active:
+            target = start + (n - 1) * self.frame_duration / 1e9
+            self._wait_until(target)
+            if not self._running:
+                break
+            # build every buffer of the frame first (at its due time, so the
+            # KLV systemtime stays current), then push them back to back
+            ready = [(stream, *stream[1](n)) for stream in active]
+            first = time.monotonic()
+            done = []
+            for stream, push, alive in ready:
+                push()
+                done.append((stream, alive, time.monotonic()))
+            self.stats.record("frame", first - target)
+            for (name, _), _, t in done:
+                self.skew.record(name, t - first)
+            self.skew.record("frame", done[-1][2] - first)
+            active = [stream for stream, alive, _ in done if alive]
+            n += 1
+            if self.report_interval and time.monotonic() >= next_report:
+                self.report()
+                next_report += self.report_interval
+        if self.on_done is not None:
+            self.on_done()
+
+    def report(self):
+        self.stats.report()
+        self.skew.report()
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+RTP packet cache for looping datasets (PACKET_CACHE in generator_slam.py).
+
+The relay in front of a camera's sink records the RTP packets of the first
+pass. Later passes are replayed from memory, so the JPEGs are parsed,
+re-encoded and payloaded only once per camera. Each replayed packet gets
+its PTS, RTP timestamp and frame id shifted by whole passes and a
+sequence number that continues from the previous packet.
+
+The memory held per relay is capped (max_bytes): packets past the budget
+are spilled to an unnamed temporary file and read back on each replay.
+"""
+import tempfile
+import threading
+import time
+
+from gi.repository import Gst
+
+from rtp_frame_id import add_frame_ext, shift_frame_ext
+
+RTP_CLOCK = 90000
+
+
+class CachingRelay:
+    """
+    appsink (after the payloader) -> appsrc (before the sink), like
+    rtp_frame_id.FrameIdRelay (ids_for_pts=None: no frame id tagging). The
+    EOS that ends the first pass is not forwarded: passes 2..loops (0 =
+    forever) are pushed from the cache by a thread instead. pace() -> the
+    monotonic start of the run, or None to leave pacing to the sinks.
+    max_bytes: memory budget of the cache (0 = none), the rest goes to disk.
+    """
+
+    def __init__(self, appsink, appsrc, ids_for_pts=None, loops=1, pass_frames=0,
+                 frame_duration=0, pace=None, name="relay", max_bytes=0):
+        self.appsrc = appsrc
+        self.ids_for_pts = ids_for_pts
+        self.loops = loops
+        self.pass_frames = pass_frames
+        self.frame_duration = frame_duration
+        self.pace = pace
+        self.name = name
+        self.max_bytes = max_bytes
+        self.packets = []     # (pts, bytes) of the first pass, (pts, length) once spilled
+        self.nbytes = 0
+        self.spill = None
+        self.spilled = 0
+        self.replayed = 0
+        self.last_pts = None
+        self._next_seq = None
+        self._running = True
+        self._thread = None
+        appsink.connect('new-sample', self._on_sample)
+        appsink.connect('eos', self._on_eos)
+
+    def _on_sample(self, sink):
+        sample = sink.emit('pull-sample')
+        buf = sample.get_buffer()
+        if self.appsrc.get_caps() is None:
+            self.appsrc.set_caps(sample.get_caps())
+        if self.ids_for_pts is not None and buf.pts != self.last_pts:
+            self.last_pts = buf.pts
+            buf = add_frame_ext(buf, *self.ids_for_pts(buf.pts))
+        data = buf.extract_dup(0, buf.get_size())
+        if self.spill is None and self.max_bytes and self.nbytes + len(data) > self.max_bytes:
+            print(f"[CACHE] {self.name}: {self.max_bytes / 1e6:.0f} MB budget reached, "
+                  "spilling the rest of the pass to disk")
+            self.spill = tempfile.TemporaryFile(prefix=f"cache_{self.name}_")
+        if self.spill is not None:
+            # packets stay in pass order: once spilling, everything goes to the file
+            self.spill.write(data)
+            self.packets.append((buf.pts, len(data)))
+            self.spilled += len(data)
+        else:
+            self.packets.append((buf.pts, data))
+            self.nbytes += len(data)
+        self._next_seq = (int.from_bytes(data[2:4], 'big') + 1) & 0xFFFF
+        return self.appsrc.emit('push-buffer', buf)
+
+    def _on_eos(self, sink):
+        if self.loops == 1 or not self.packets:
+            self.appsrc.emit('end-of-stream')
+            return
+        if self.spill is not None:
+            self.spill.flush()
+        print(f"[CACHE] {self.name}: {len(self.packets)} packets, {self.nbytes / 1e6:.1f} MB cached, "
+              f"{self.spilled / 1e6:.1f} MB on disk, replaying")
+        self._thread = threading.Thread(target=self._replay, name=f"replay_{self.name}", daemon=True)
+        self._thread.start()
+
+    def _replay(self):
+        loop = 1
+        seq = self._next_seq
+        pass_ns = self.pass_frames * self.frame_duration
+        while self._running and (self.loops == 0 or loop < self.loops):
+            dt = loop * pass_ns
+            dts = dt * RTP_CLOCK // Gst.SECOND
+            start = self.pace() if self.pace else None
+            if self.spill is not None:
+                self.spill.seek(0)
+            for pts, data in self.packets:
+                if isinstance(data, int):
+                    data = self.spill.read(data)
+                packet = bytearray(data)
+                packet[2:4] = seq.to_bytes(2, 'big')
+                ts = (int.from_bytes(packet[4:8], 'big') + dts) & 0xFFFFFFFF
+                packet[4:8] = ts.to_bytes(4, 'big')
+                if self.ids_for_pts is not None:
+                    shift_frame_ext(packet, loop * self.pass_frames)
+                seq = (seq + 1) & 0xFFFF
+                buf = Gst.Buffer.new_wrapped(bytes(packet))
+                buf.pts = pts + dt
+                if start is not None:
+                    wait = start + buf.pts / Gst.SECOND - time.monotonic()
+                    if wait > 0:
+                        time.sleep(wait)
+                if not self._running or self.appsrc.emit('push-buffer', buf) != Gst.FlowReturn.OK:
+                    return
+            self.replayed += 1
+            loop += 1
+        self.appsrc.emit('end-of-stream')
+
+    def stop(self):
+        self._running = False
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+        if self.spill is not None:
+            self.spill.close()
+
+    def report(self):
+        print(f"[CACHE] {self.name}: {len(self.packets)} packets, {self.nbytes / 1e6:.1f} MB "
+              f"(+{self.spilled / 1e6:.1f} MB on disk), {self.replayed} pass(es) replayed from cache")
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Bounded read-ahead for the generators: a background thread reads the next
+frames of a sequence so the appsrc need-data callback only pops a ready
+buffer instead of doing file I/O on the streaming thread.
+"""
+import threading
+import time
+from collections import deque
+
+
+class FramePrefetcher:
+    """
+    Reads frames start, start+1, ... with read_frame(idx) -> bytes, or None
+    at the end of the sequence. At most `depth` frames and `max_bytes` bytes
+    are held (one frame is always allowed, even if larger than the budget).
+
+    Counters: hits (frame was ready), misses (get() had to wait for the
+    reader), stalls (a wait longer than stall_threshold seconds).
+    """
+
+    def __init__(self, read_frame, start=1, depth=8, max_bytes=64 << 20,
+                 stall_threshold=0.005, name="prefetch"):
+        self.name = name
+        self.depth = depth
+        self.max_bytes = max_bytes
+        self.stall_threshold = stall_threshold
+        self.hits = 0
+        self.misses = 0
+        self.stalls = 0
+        self.wait_time = 0.0
+        self.max_wait = 0.0
+
+        self._read = read_frame
+        self._next = start
+        self._frames = deque()
+        self._bytes = 0
+        self._eof = False
+        self._generation = 0
+        self._running = True
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def _full(self):
+        return len(self._frames) >= self.depth or (self._frames and self._bytes >= self.max_bytes)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._running and (self._eof or self._full()):
+                    self._cond.wait()
+                if not self._running:
+                    return
+                idx = self._next
+                generation = self._generation
+            # file I/O outside the lock so get() never waits on it needlessly
+            data = self._read(idx)
+            with self._cond:
+                if generation != self._generation:
+                    continue  # reset() while reading, this frame is stale
+                if data is None:
+                    self._eof = True
+                    self._cond.notify_all()
+                    continue
+                self._frames.append((idx, data))
+                self._bytes += len(data)
+                self._next += 1
+                self._cond.notify_all()
+
+    def get(self):
+        """Returns (idx, data) for the next frame, or None at end of sequence."""
+        with self._cond:
+            if self._frames:
+                self.hits += 1
+            elif self._eof or not self._running:
+                return None
+            else:
+                self.misses += 1
+                t0 = time.monotonic()
+                while not self._frames and not self._eof and self._running:
+                    self._cond.wait()
+                waited = time.monotonic() - t0
+                self.wait_time += waited
+                self.max_wait = max(self.max_wait, waited)
+                if waited > self.stall_threshold:
+                    self.stalls += 1
+                if not self._frames:
+                    return None
+            idx, data = self._frames.popleft()
+            self._bytes -= len(data)
+            self._cond.notify_all()
+            return idx, data
+
+    def reset(self, start):
+        """Drops the read-ahead and restarts reading at frame `start` (after a seek)."""
+        with self._cond:
+            self._frames.clear()
+            self._bytes = 0
+            self._next = start
+            self._eof = False
+            self._generation += 1
+            self._cond.notify_all()
+
+    def stop(self):
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        self._thread.join(timeout=1.0)
+
+    def stats(self):
+        with self._cond:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'stalls': self.stalls,
+                'wait_ms': round(self.wait_time * 1000, 3),
+                'max_wait_ms': round(self.max_wait * 1000, 3),
+                'queued': len(self._frames),
+                'queued_bytes': self._bytes,
+            }
+
+    def report(self):
+        s = self.stats()
+        print(f"[PREFETCH] {self.name}: hits={s['hits']} misses={s['misses']} stalls={s['stalls']} "
+              f"wait={s['wait_ms']:.1f}ms max_wait={s['max_wait_ms']:.1f}ms "
+              f"queued={s['queued']} ({s['queued_bytes']} B)")
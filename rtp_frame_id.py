@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Frame id / trigger id carried in a one-byte RTP header extension (RFC 8285)
+on the first packet of every RTP/JPEG or RTP/H.264 frame: 8 bytes, frame
+id then trig_id, both big-endian uint32.
+
+Generator side: FrameIdRelay sits between the payloader and the sink
+(rtpjpegpay ! appsink ... appsrc ! sink). A pad probe cannot rewrite the
+packets because PyGObject keeps its own reference on probe buffers, which
+makes them read-only. Only the tagged packet is copied, the rest are
+forwarded untouched.
+
+Client side: FrameIdProbe reads the extension on the depayloader sink pad
+and hands it to the depayloaded frame on the src pad, keyed by PTS.
+"""
+import struct
+import threading
+
+import gi
+gi.require_version('Gst', '1.0')
+gi.require_version('GstRtp', '1.0')
+from gi.repository import Gst, GstRtp
+
+EXT_ID = 1
+_IDS = struct.Struct(">II")
+
+
+def add_frame_ext(buf, frame_id, trig_id, ext_id=EXT_ID):
+    """Writable copy of RTP packet `buf` with the frame id extension added."""
+    out = buf.copy()
+    ok, rtp = GstRtp.RTPBuffer.map(out, Gst.MapFlags.READWRITE)
+    if not ok:
+        return buf
+    rtp.add_extension_onebyte_header(ext_id, _IDS.pack(frame_id & 0xFFFFFFFF, trig_id & 0xFFFFFFFF))
+    rtp.unmap()
+    return out
+
+
+def read_frame_ext(buf, ext_id=EXT_ID):
+    """(frame_id, trig_id) from an RTP packet, or None if it has no extension."""
+    ok, rtp = GstRtp.RTPBuffer.map(buf, Gst.MapFlags.READ)
+    if not ok:
+        return None
+    try:
+        found, data = rtp.get_extension_onebyte_header(ext_id, 0)
+    finally:
+        rtp.unmap()
+    if not found or len(data) < _IDS.size:
+        return None
+    return _IDS.unpack_from(bytes(data))
+
+
+def shift_frame_ext(packet, delta, ext_id=EXT_ID):
+    """
+    Adds `delta` to frame id and trig_id of a raw RTP packet (bytearray) in
+    place. Returns False if the packet has no frame id extension.
+    """
+    if not packet[0] & 0x10:
+        return False
+    off = 12 + 4 * (packet[0] & 0x0F)
+    if packet[off:off + 2] != b"\xbe\xde":
+        return False
+    i, end = off + 4, off + 4 + 4 * int.from_bytes(packet[off + 2:off + 4], 'big')
+    while i < end:
+        if packet[i] == 0:  # padding
+            i += 1
+            continue
+        eid, length = packet[i] >> 4, (packet[i] & 0x0F) + 1
+        if eid == 15:
+            break
+        if eid == ext_id and length >= _IDS.size:
+            frame_id, trig_id = _IDS.unpack_from(packet, i + 1)
+            _IDS.pack_into(packet, i + 1, (frame_id + delta) & 0xFFFFFFFF, (trig_id + delta) & 0xFFFFFFFF)
+            return True
+        i += 1 + length
+    return False
+
+
+class FrameIdRelay:
+    """
+    appsink (after the payloader) -> appsrc (before the sink). The first packet
+    of each frame gets ids from ids_for_pts(pts) -> (frame_id, trig_id).
+    """
+
+    def __init__(self, appsink, appsrc, ids_for_pts):
+        self.appsrc = appsrc
+        self.ids_for_pts = ids_for_pts
+        self.last_pts = None
+        self.tagged = 0
+        appsink.connect('new-sample', self._on_sample)
+        appsink.connect('eos', lambda sink: appsrc.emit('end-of-stream'))
+
+    def _on_sample(self, sink):
+        sample = sink.emit('pull-sample')
+        buf = sample.get_buffer()
+        if self.appsrc.get_caps() is None:
+            self.appsrc.set_caps(sample.get_caps())
+        if buf.pts != self.last_pts:
+            self.last_pts = buf.pts
+            buf = add_frame_ext(buf, *self.ids_for_pts(buf.pts))
+            self.tagged += 1
+        return self.appsrc.emit('push-buffer', buf)
+
+
+class FrameIdProbe:
+    """
+    Installs probes on a depayloader (rtpjpegdepay, rtph264depay) and records the ids of each
+    depayloaded frame by PTS; lookup(pts) pops them.
+    """
+
+    def __init__(self, depay, max_entries=256):
+        self.max_entries = max_entries
+        self._current = None
+        self._by_pts = {}
+        self._lock = threading.Lock()
+        depay.get_static_pad('sink').add_probe(Gst.PadProbeType.BUFFER, self._on_packet)
+        depay.get_static_pad('src').add_probe(Gst.PadProbeType.BUFFER, self._on_frame)
+
+    def _on_packet(self, pad, info):
+        ids = read_frame_ext(info.get_buffer())
+        if ids is not None:
+            self._current = ids
+        return Gst.PadProbeReturn.OK
+
+    def _on_frame(self, pad, info):
+        # the depayloader pushes the frame from the chain call of its last
+        # packet, so _current still holds this frame's ids
+        if self._current is not None:
+            with self._lock:
+                self._by_pts[info.get_buffer().pts] = self._current
+                if len(self._by_pts) > self.max_entries:
+                    self._by_pts.pop(next(iter(self._by_pts)))
+            self._current = None
+        return Gst.PadProbeReturn.OK
+
+    def lookup(self, pts):
+        with self._lock:
+            return self._by_pts.pop(pts, None)
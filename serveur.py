@@ -1,6 +1,8 @@
 
 #!/usr/bin/env python3
+import os
 import gi
+from jpeg_passthrough import check_jpeg
 gi.require_version('Gst', '1.0')
 from gi.repository import Gst, GObject, GLib
 
@@ -9,6 +11,8 @@ IMAGE_DIR = "/home/smith/dataset/sequences/00/image_0/jpgs"
 PATTERN   = "%06d.jpg"   # ex. 000001.jpg, 000002.jpg, …
 FPS       = 10
 SINK_URI  = "srt://127.0.0.1:6020?mode=listener"
+# Envoie les JPEG tels quels si le premier fichier est compatible rtpjpegpay
+JPEG_PASSTHROUGH = True
 
 # --- Gestion des messages du bus GStreamer ---
 def on_message(bus, message, loop):
@@ -28,14 +32,20 @@ def main():
     GObject.threads_init()
     Gst.init(None)
 
+    # multifilesrc ne permet pas de trier image par image : on vérifie la
+    # première et on choisit le chemin pour toute la séquence
+    passthrough = False
+    if JPEG_PASSTHROUGH:
+        with open(os.path.join(IMAGE_DIR, PATTERN % 1), 'rb') as f:
+            passthrough, reason = check_jpeg(f.read())
+        print(f"[JPEG] passthrough={passthrough}" + ("" if passthrough else f" ({reason}), ré-encodage"))
+    transcode = "" if passthrough else "! decodebin ! videoconvert ! video/x-raw,format=I420 ! jpegenc "
+
     # Construction du pipeline en une seule chaîne
     pipeline_description = (
         f"multifilesrc location={IMAGE_DIR}/{PATTERN} index=1 "
         f"caps=\"image/jpeg,framerate={FPS}/1\" "
-        "! decodebin "
-        "! videoconvert "
-        "! video/x-raw,format=I420 "
-        "! jpegenc "
+        f"{transcode}"
         "! jpegparse "
         "! rtpjpegpay mtu=1316 "
         f"! srtserversink uri={SINK_URI}"
@@ -0,0 +1,28 @@
+#!/usr/bin/env python3
+"""
+Side-by-side stereo packing (STEREO_PACK in generator_slam.py): the frames
+of all cameras are composited left to right, in CAMERAS order, into one
+frame sent as a single RTP stream, so a pair is always sent, lost or
+received as a whole.
+"""
+
+
+def x_offsets(widths):
+    """Left edge of each camera in the packed frame."""
+    out, x = [], 0
+    for w in widths:
+        out.append(x)
+        x += w
+    return out
+
+
+def split_views(frame, widths=None, count=2):
+    """
+    Numpy views (no copy) of each camera in a packed HxWxC frame. widths
+    defaults to `count` equal parts.
+    """
+    if widths is None:
+        if frame.shape[1] % count:
+            raise ValueError(f"packed width {frame.shape[1]} not divisible by {count}")
+        widths = [frame.shape[1] // count] * count
+    return [frame[:, x:x + w] for x, w in zip(x_offsets(widths), widths)]
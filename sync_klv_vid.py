@@ -7,6 +7,7 @@ import cv2
 import numpy as np
 from collections import deque
 import info_pb2  # votre protobuf
+from net_clock import slave_from_klv, use, log_offset
 
 gi.require_version('Gst', '1.0')
 from gi.repository import Gst, GLib
@@ -17,6 +18,12 @@ TCP_PORT = 7000
 SRC_URI_LEFT = "srt://127.0.0.1:6020?mode=caller"
 SRC_URI_RIGHT = "srt://127.0.0.1:6021?mode=caller"
 
+# Horloge réseau du générateur (NET_CLOCK_PORT de generator_slam.py) : lue dans
+# le clock_id du premier KLV, les trois pipelines s'y asservissent avec le même
+# base time. Sinon (ou si le KLV n'en annonce pas) : horloge système locale.
+NET_CLOCK = True
+CLOCK_LOG_INTERVAL_S = 5
+
 cv2.namedWindow("SyncViewLeft", cv2.WINDOW_AUTOSIZE)
 cv2.namedWindow("SyncViewRight", cv2.WINDOW_AUTOSIZE)
 
@@ -190,8 +197,12 @@ def main():
     Gst.init(None)
 
     # Horloge partagée
-    clock = Gst.SystemClock.obtain()
-    start_time = clock.get_time()
+    clock, start_time = slave_from_klv(TCP_HOST, TCP_PORT) if NET_CLOCK else (None, None)
+    if clock is None:
+        clock = Gst.SystemClock.obtain()
+        start_time = clock.get_time()
+    else:
+        log_offset(clock, CLOCK_LOG_INTERVAL_S)
 
     # Pipeline metadata unique démultiplexé
     meta_launch = (
@@ -200,8 +211,6 @@ def main():
         f"dmx. ! queue ! meta/x-klv,parsed=true,framerate=4/1 ! queue ! appsink name=klv_sink_right emit-signals=true drop=true sync=false"
     )
     meta_pipeline = Gst.parse_launch(meta_launch)
-    meta_pipeline.use_clock(clock)
-    meta_pipeline.set_base_time(start_time)
 
     klv_left = meta_pipeline.get_by_name('klv_sink_left')
     klv_left.connect('new-sample', on_new_klv_left_sample)
@@ -214,8 +223,6 @@ def main():
         "! rtpjpegdepay ! jpegparse "
         "! queue ! appsink name=video_left_sink caps=\"image/jpeg\" emit-signals=true sync=true"
     )
-    video_left.use_clock(clock)
-    video_left.set_base_time(start_time)
     sink_left = video_left.get_by_name('video_left_sink')
     sink_left.connect('new-sample', make_video_callback('left', 'SyncViewLeft'))
 
@@ -224,11 +231,11 @@ def main():
         "! rtpjpegdepay ! jpegparse "
         "! queue ! appsink name=video_right_sink caps=\"image/jpeg\" emit-signals=true sync=true"
     )
-    video_right.use_clock(clock)
-    video_right.set_base_time(start_time)
     sink_right = video_right.get_by_name('video_right_sink')
     sink_right.connect('new-sample', make_video_callback('right', 'SyncViewRight'))
 
+    use((meta_pipeline, video_left, video_right), clock, start_time)
+
     # Démarrage et loop
     loop = GLib.MainLoop()
     for p in (meta_pipeline, video_left, video_right):
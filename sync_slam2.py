@@ -9,9 +9,16 @@ import hashlib
 import struct
 import threading
 import queue
+import heapq
+import weakref
 import numpy as np
 import cv2
 from collections import defaultdict
+from rtp_frame_id import FrameIdProbe
+from stereo_pack import split_views
+from net_clock import slave_from_klv, use, log_offset
+from frame_stamp import decode as decode_stamp
+from pacer import JitterStats
 
 gi.require_version('Gst', '1.0')
 from gi.repository import Gst, GLib
@@ -23,9 +30,51 @@ PATTERN         = "img%05d.jpg"
 FPS             = 4
 VIDEO_SRT_URI_LEFT  = "srt://127.0.0.1:6020?mode=caller"
 VIDEO_SRT_URI_RIGHT = "srt://127.0.0.1:6021?mode=caller"
+# Generator PREVIEW streams (port + PREVIEW_PORT_OFFSET)
+PREVIEW_SRT_URI_LEFT  = "srt://127.0.0.1:6120?mode=caller"
+PREVIEW_SRT_URI_RIGHT = "srt://127.0.0.1:6121?mode=caller"
 TCP_HOST            = "127.0.0.1"
 TCP_PORT            = 7000
 SKIP = 3
+# Join frames and KLV on the frame id sent by the generator (RTP header
+# extension / StreamInfo.id) instead of aligned PTS buckets; needs
+# RTP_FRAME_ID = True in generator_slam.py
+JOIN_BY_FRAME_ID = False
+# With JOIN_BY_FRAME_ID: "id" joins in the PTS bucket table keyed by frame
+# id; "trig_id" groups the 4 members (frame/KLV x left/right) of one capture
+# by trig_id, emits the pair as soon as the group is complete and evicts
+# groups more than TRIG_EVICT_DISTANCE triggers behind the newest
+JOIN_KEY = "trig_id"
+TRIG_EVICT_DISTANCE = 16
+# Must match CODEC in generator_slam.py
+CODEC = "jpeg"
+# caps ! depayloader ! decoder per codec, {s} = l / r
+DEPAY_DECODE = {
+    'jpeg': "application/x-rtp,media=video,encoding-name=JPEG,payload=26 ! rtpjpegdepay name=depay_{s} ! nvjpegdec",
+    'h264': "application/x-rtp,media=video,encoding-name=H264,payload=96 ! rtph264depay name=depay_{s} ! avdec_h264",
+}
+# Generator with STEREO_PACK = True: one side-by-side stream on the left URI,
+# split into left/right views (STEREO_WIDTHS = None: two equal halves)
+STEREO_PACK = False
+STEREO_WIDTHS = None
+# "full": full-resolution streams only, "preview": the low-res preview
+# streams take their place (same PTS / frame ids, so the join is unchanged),
+# "both": full streams are joined, previews are only displayed
+SUBSCRIBE = "full"
+# Slave the pipeline to the generator's network clock and base time, read from
+# the clock_id of the first KLV (generator NET_CLOCK_PORT); the local system
+# clock is kept if the KLV announces none. Offset logged every CLOCK_LOG_INTERVAL_S.
+NET_CLOCK = True
+CLOCK_LOG_INTERVAL_S = 5
+# Generator with FRAME_STAMP = True: read the frame id and send time burnt
+# into each decoded frame (frame_stamp.py). Reports the end-to-end latency
+# (pipeline clock at the appsink - send time; needs NET_CLOCK across
+# machines) every STAMP_REPORT_S. Logs frames over STAMP_SPIKE_MS, stamps
+# that disagree with the RTP frame id, and pairs whose sides carry
+# different stamps.
+STAMP_CHECK = False
+STAMP_SPIKE_MS = 200
+STAMP_REPORT_S = 10
 
 # Initialize GStreamer and keys/indexes
 Gst.init(None)
@@ -46,19 +95,45 @@ class SRTSyncClient:
         self.running = True
         self.start_pts = None
 
-        threading.Thread(target=self._process_samples, daemon=True).start()
+        self.evicted = 0
+        self.late = 0
+        self.stamp_latency = JitterStats(tag="E2E")
+        self.stamp_counts = defaultdict(int)   # unreadable / id_mismatch / pair_mismatch / spikes
+        if STAMP_CHECK:
+            GLib.timeout_add_seconds(STAMP_REPORT_S, lambda: self.stamp_latency.report() or True)
+        by_trig = JOIN_BY_FRAME_ID and JOIN_KEY == "trig_id"
+        threading.Thread(target=self._process_by_trig if by_trig else self._process_samples, daemon=True).start()
         self._build_pipeline()
 
+    def _side_desc(self, uri, s, decode):
+        return (
+            f"srtsrc latency=1000 uri={uri} ! queue !"
+            f"{decode.format(s=s)} ! tee name=tee_{s} "
+            f"tee_{s}. ! queue max-size-buffers=1 leaky=downstream ! videoconvert ! video/x-raw,format=RGB ! appsink name=vid_{s} emit-signals=true sync=true "
+            f"tee_{s}. ! fakesink sync=false "
+        )
+
+    def _video_desc(self):
+        if STEREO_PACK:
+            return (
+                f"srtsrc latency=1000 uri={VIDEO_SRT_URI_LEFT} ! queue !"
+                f"{DEPAY_DECODE[CODEC].format(s='s')} ! "
+                "queue max-size-buffers=1 leaky=downstream ! videoconvert ! video/x-raw,format=BGR ! appsink name=vid_s emit-signals=true sync=true "
+            )
+        if SUBSCRIBE == "preview":
+            # previews are always RTP/JPEG
+            return (self._side_desc(PREVIEW_SRT_URI_LEFT, 'l', DEPAY_DECODE['jpeg']) +
+                    self._side_desc(PREVIEW_SRT_URI_RIGHT, 'r', DEPAY_DECODE['jpeg']))
+        desc = (self._side_desc(VIDEO_SRT_URI_LEFT, 'l', DEPAY_DECODE[CODEC]) +
+                self._side_desc(VIDEO_SRT_URI_RIGHT, 'r', DEPAY_DECODE[CODEC]))
+        if SUBSCRIBE == "both":
+            desc += (self._side_desc(PREVIEW_SRT_URI_LEFT, 'pl', DEPAY_DECODE['jpeg']) +
+                     self._side_desc(PREVIEW_SRT_URI_RIGHT, 'pr', DEPAY_DECODE['jpeg']))
+        return desc
+
     def _build_pipeline(self):
         desc = (
-            f"srtsrc latency=1000 uri={VIDEO_SRT_URI_LEFT} ! queue !"
-            "application/x-rtp,media=video,encoding-name=JPEG,payload=26 ! rtpjpegdepay name=depay_l ! nvjpegdec ! tee name=tee_l "
-            "tee_l. ! queue max-size-buffers=1 leaky=downstream ! videoconvert ! video/x-raw,format=RGB ! appsink name=vid_l emit-signals=true sync=true "
-            "tee_l. ! fakesink sync=false "
-            f"srtsrc latency=1000 uri={VIDEO_SRT_URI_RIGHT} ! queue !"
-            "application/x-rtp,media=video,encoding-name=JPEG,payload=26 ! rtpjpegdepay name=depay_r ! nvjpegdec ! tee name=tee_r "
-            "tee_r. ! queue max-size-buffers=1 leaky=downstream ! videoconvert ! video/x-raw,format=RGB ! appsink name=vid_r emit-signals=true sync=true "
-            "tee_r. ! fakesink sync=false "
+            self._video_desc() +
             f"tcpclientsrc host={TCP_HOST} port={TCP_PORT} ! tsdemux name=dmx "
             "dmx. ! queue ! meta/x-klv,parsed=true ! appsink name=klv_l emit-signals=true sync=false drop=false "
             "dmx. ! queue ! meta/x-klv,parsed=true ! appsink name=klv_r emit-signals=true sync=false drop=false"
@@ -66,17 +141,33 @@ class SRTSyncClient:
         print("[PIPELINE] Launching pipeline:\n", desc)
         pipe = Gst.parse_launch(desc)
         # pad-probes to capture PTS before GPU decode
-        for elem_name in ('depay_l', 'depay_r'):
+        sides = {'stereo': 'depay_s'} if STEREO_PACK else {'left': 'depay_l', 'right': 'depay_r'}
+        for elem_name in sides.values():
             elem = pipe.get_by_name(elem_name)
             pad = elem.get_static_pad('src')
             pad.add_probe(Gst.PadProbeType.BUFFER, self._on_probe)
 
+        if JOIN_BY_FRAME_ID:
+            self.frame_ids = {side: FrameIdProbe(pipe.get_by_name(depay)) for side, depay in sides.items()}
+
         # connect sinks
-        pipe.get_by_name('vid_l').connect('new-sample', self._on_video, 'left')
-        pipe.get_by_name('vid_r').connect('new-sample', self._on_video, 'right')
+        if STEREO_PACK:
+            pipe.get_by_name('vid_s').connect('new-sample', self._on_stereo)
+        else:
+            pipe.get_by_name('vid_l').connect('new-sample', self._on_video, 'left')
+            pipe.get_by_name('vid_r').connect('new-sample', self._on_video, 'right')
+            if SUBSCRIBE == "both":
+                pipe.get_by_name('vid_pl').connect('new-sample', self._on_preview, 'left')
+                pipe.get_by_name('vid_pr').connect('new-sample', self._on_preview, 'right')
         pipe.get_by_name('klv_l').connect('new-sample', self._on_meta,  'left')
         pipe.get_by_name('klv_r').connect('new-sample', self._on_meta,  'right')
 
+        if NET_CLOCK:
+            clock, base_time = slave_from_klv(TCP_HOST, TCP_PORT)
+            if clock is not None:
+                use((pipe,), clock, base_time)
+                log_offset(clock, CLOCK_LOG_INTERVAL_S)
+
         bus = pipe.get_bus()
         bus.add_signal_watch()
         bus.connect('message', self._on_message)
@@ -114,6 +205,8 @@ class SRTSyncClient:
         buf = sample.get_buffer()
         pts = buf.pts / Gst.SECOND
         print(f"[META] side={side}, raw PTS={pts:.3f}s")
+        if JOIN_BY_FRAME_ID:
+            return self._on_meta_by_id(buf, side, pts)
         if pts <= SKIP or (self.start_pts and pts < self.start_pts):
             return Gst.FlowReturn.OK
         if self.start_pts is None and buf.pts != Gst.CLOCK_TIME_NONE:
@@ -145,6 +238,16 @@ class SRTSyncClient:
         buf = sample.get_buffer()
         pts = buf.pts / Gst.SECOND
         print(f"[VIDEO] side={side}, raw PTS={pts:.3f}s")
+        if JOIN_BY_FRAME_ID:
+            ids = self.frame_ids[side].lookup(buf.pts)
+            if ids is None:
+                print(f"[VIDEO] side={side}, no frame id for PTS={pts:.3f}s, dropped")
+                return Gst.FlowReturn.OK
+            img = self._map_frame(sample, buf)
+            if STAMP_CHECK and img is not None:
+                self._check_stamp(side, img, ids[0])
+            self.sample_queue.put(('frame', side, img, pts, self._join_id(ids)))
+            return Gst.FlowReturn.OK
         if pts <= SKIP:
             return Gst.FlowReturn.OK
         if self.start_pts is None:
@@ -167,6 +270,100 @@ class SRTSyncClient:
         self.sample_queue.put(('frame', side, frame_img, pts, red))
         return Gst.FlowReturn.OK
 
+    def _on_preview(self, sink, side):
+        # display only, the join runs on the full-resolution streams
+        sample = sink.emit('pull-sample')
+        img = self._map_frame(sample, sample.get_buffer())
+        if img is not None:
+            GLib.idle_add(lambda: (cv2.imshow(f'Preview {side}', img), cv2.waitKey(1)) and False)
+        return Gst.FlowReturn.OK
+
+    def _on_stereo(self, sink):
+        # both sides come from the same packed frame: same PTS, same frame id
+        sample = sink.emit('pull-sample')
+        buf = sample.get_buffer()
+        pts = buf.pts / Gst.SECOND
+        if JOIN_BY_FRAME_ID:
+            ids = self.frame_ids['stereo'].lookup(buf.pts)
+            if ids is None:
+                print(f"[VIDEO] stereo, no frame id for PTS={pts:.3f}s, dropped")
+                return Gst.FlowReturn.OK
+            key = self._join_id(ids)
+        else:
+            key = self._align_pts(pts)
+        ok, info = buf.map(Gst.MapFlags.READ)
+        if not ok:
+            return Gst.FlowReturn.OK
+        s = sample.get_caps().get_structure(0)
+        height, width = s.get_value('height'), s.get_value('width')
+        # no copy: the sides are views on the mapped buffer (BGR rows padded to
+        # 4 bytes), which is unmapped once the consumer has dropped both of them
+        packed = np.ndarray((height, width, 3), np.uint8, buffer=info.data,
+                            strides=((width * 3 + 3) & ~3, 3, 1))
+        weakref.finalize(packed, buf.unmap, info)
+        left, right = split_views(packed, STEREO_WIDTHS)
+        if STAMP_CHECK:
+            self._check_stamp('left', left, ids[0] if JOIN_BY_FRAME_ID else None)
+            self._check_stamp('right', right, ids[0] if JOIN_BY_FRAME_ID else None)
+        print(f"[VIDEO] stereo, raw PTS={pts:.3f}s, key={key}")
+        self.sample_queue.put(('frame', 'left', left, pts, key))
+        self.sample_queue.put(('frame', 'right', right, pts, key))
+        return Gst.FlowReturn.OK
+
+    def _check_stamp(self, side, img, frame_id=None):
+        index, t_ns, valid = decode_stamp(img)
+        if not valid:
+            self.stamp_counts['unreadable'] += 1
+            return
+        latency = (self.pipeline.get_clock().get_time() - t_ns) / Gst.SECOND
+        self.stamp_latency.record(side, latency)
+        if frame_id is not None and index != frame_id:
+            self.stamp_counts['id_mismatch'] += 1
+            print(f"[STAMP] {side}: stamped frame {index} arrived as frame id {frame_id}")
+        if latency * 1e3 > STAMP_SPIKE_MS:
+            self.stamp_counts['spikes'] += 1
+            print(f"[STAMP] {side}: frame {index} latency {latency * 1e3:.1f}ms")
+
+    def _map_frame(self, sample, buf):
+        ok, info = buf.map(Gst.MapFlags.READ)
+        if not ok:
+            return None
+        s = sample.get_caps().get_structure(0)
+        frame_rgb = np.ndarray((s.get_value('height'), s.get_value('width'), 3), dtype=np.uint8, buffer=info.data)
+        frame_img = cv2.cvtColor(frame_rgb, cv2.COLOR_RGB2BGR)
+        buf.unmap(info)
+        return frame_img
+
+    def _join_id(self, ids):
+        # RTP frame id extension: (frame id, trig_id)
+        return ids[1] if JOIN_KEY == "trig_id" else ids[0]
+
+    def _key_label(self, red):
+        """Join key for the logs: integer frame id / trig_id, or the aligned PTS in seconds."""
+        if JOIN_BY_FRAME_ID:
+            return f"{'trig_id' if JOIN_KEY == 'trig_id' else 'frame_id'}={red}"
+        return f"red={red:.3f}s"
+
+    def _on_meta_by_id(self, buf, side, pts):
+        ok, info = buf.map(Gst.MapFlags.READ)
+        if not ok:
+            return Gst.FlowReturn.OK
+        data = bytes(info.data)
+        buf.unmap(info)
+        if len(data) < 20:
+            return Gst.FlowReturn.OK
+        length = struct.unpack('>I', data[16:20])[0]
+        msg = info_pb2.StreamInfo()
+        try:
+            msg.ParseFromString(data[20:20+length])
+        except Exception:
+            return Gst.FlowReturn.OK
+        key = msg.trig_id if JOIN_KEY == "trig_id" else msg.id
+        if key:
+            print(f"[META] side={side}, frame id={msg.id}, trig_id={msg.trig_id}, pts={msg.pts}, filename={msg.filename}")
+            self.sample_queue.put(('klv', side, msg.filename, pts, key))
+        return Gst.FlowReturn.OK
+
     def _align_pts(self, pts):
         if pts < 0:
             return -1
@@ -198,7 +395,7 @@ class SRTSyncClient:
         while self.running:
             try:
                 typ, side, data, pts, red = self.sample_queue.get(timeout=0.1)
-                print(f"[QUEUE] Received {typ} {side}, raw PTS={pts:.3f}s, red={red:.3f}s")
+                print(f"[QUEUE] Received {typ} {side}, raw PTS={pts:.3f}s, {self._key_label(red)}")
             except queue.Empty:
                 continue
 
@@ -213,7 +410,7 @@ class SRTSyncClient:
                         debug_parts.append(f"{name}=True({ent[pts_key]:.3f}s)")
                     else:
                         debug_parts.append(f"{name}=False")
-                print(f"[DEBUG] avant insert red={red:.3f}s → " + ", ".join(debug_parts))
+                print(f"[DEBUG] avant insert {self._key_label(red)} → " + ", ".join(debug_parts))
 
                 # Insérer la frame ou le KLV dans le bucket
                 key = f"{typ[0]}_{side[0]}"  # 'f'rame/'k'lv + 'l'eft/'r'ight
@@ -229,37 +426,82 @@ class SRTSyncClient:
                         debug_parts.append(f"{name}=True({ent[pts_key]:.3f}s)")
                     else:
                         debug_parts.append(f"{name}=False")
-                print(f"[DEBUG] après insert red={red:.3f}s → " + ", ".join(debug_parts))
+                print(f"[DEBUG] après insert {self._key_label(red)} → " + ", ".join(debug_parts))
 
                 # Dès qu'on a les 4 (f_l, f_r, k_l, k_r), on synchronise
                 if all(ent.get(k) is not None for k in ('f_l', 'f_r', 'k_l', 'k_r')):
-                    # Affichage récapitulatif des PTS
-                    print(
-                        f"[SYNC] red={red:.3f}s  "
-                        f"fl={ent['pts_f_l']:.3f}s  fr={ent['pts_f_r']:.3f}s  "
-                        f"kl={ent['pts_k_l']:.3f}s  kr={ent['pts_k_r']:.3f}s"
-                    )
-
-                    # Concaténation des images gauche/droite
-                    L, R = ent['f_l'], ent['f_r']
-                    img = np.hstack((L, R))
-
-                    # Annotation des noms de fichiers KLV
-                    left_name = ent['k_l'].split('/')[-1] if isinstance(ent['k_l'], str) else ''
-                    right_name = ent['k_r'].split('/')[-1] if isinstance(ent['k_r'], str) else ''
-                    text = f"LEFT: {left_name}   |   RIGHT: {right_name}"
-                    cv2.putText(img, text, (10, 30), cv2.FONT_HERSHEY_SIMPLEX,
-                                1, (0, 255, 0), 2, cv2.LINE_AA)
-
-                    # Sauvegarde et affichage
-                    name = f"{red:.3f}.png".replace('/', '_')
-                    os.makedirs('save', exist_ok=True)
-                    cv2.imwrite(os.path.join('save', name), img)
-                    GLib.idle_add(lambda: (cv2.imshow('Sync', img), cv2.waitKey(1)))
+                    self._emit_pair(red, ent)
 
                     # Nettoyage du bucket
                     del self.sync_buffer[red]
 
+    def _process_by_trig(self):
+        print("[PROCESS] trig_id join thread started")
+        groups = {}   # trig_id -> entry
+        pending = []  # heap of the trig_ids in groups (completed ones are skipped when popped)
+        newest = 0
+        while self.running:
+            try:
+                typ, side, data, pts, trig = self.sample_queue.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            if trig < newest - TRIG_EVICT_DISTANCE:
+                self.late += 1
+                print(f"[LATE] {typ} {side} trig_id={trig}, newest={newest}, dropped")
+                continue
+            if trig not in groups:
+                groups[trig] = {}
+                heapq.heappush(pending, trig)
+            ent = groups[trig]
+            key = f"{typ[0]}_{side[0]}"
+            ent[key] = data
+            ent[f"pts_{key}"] = pts
+            if all(k in ent for k in ('f_l', 'f_r', 'k_l', 'k_r')):
+                del groups[trig]
+                self._emit_pair(trig, ent)
+            if trig > newest:
+                newest = trig
+                # lowest trig_ids first, whatever order their samples arrived in
+                while pending and pending[0] < newest - TRIG_EVICT_DISTANCE:
+                    oldest = heapq.heappop(pending)
+                    if oldest not in groups:
+                        continue
+                    print(f"[EVICT] trig_id={oldest} incomplete: {sorted(k for k in groups[oldest] if not k.startswith('pts_'))}")
+                    del groups[oldest]
+                    self.evicted += 1
+
+    def _emit_pair(self, red, ent):
+        # Affichage récapitulatif des PTS
+        print(
+            f"[SYNC] {self._key_label(red)}  "
+            f"fl={ent['pts_f_l']:.3f}s  fr={ent['pts_f_r']:.3f}s  "
+            f"kl={ent['pts_k_l']:.3f}s  kr={ent['pts_k_r']:.3f}s"
+        )
+        if ent['f_l'] is None or ent['f_r'] is None:
+            return
+
+        # Concaténation des images gauche/droite
+        L, R = ent['f_l'], ent['f_r']
+        if STAMP_CHECK:
+            (il, _, ok_l), (ir, _, ok_r) = decode_stamp(L), decode_stamp(R)
+            if ok_l and ok_r and il != ir:
+                self.stamp_counts['pair_mismatch'] += 1
+                print(f"[STAMP] pair {red}: left frame {il} joined with right frame {ir}")
+        img = np.hstack((L, R))
+
+        # Annotation des noms de fichiers KLV
+        left_name = ent['k_l'].split('/')[-1] if isinstance(ent['k_l'], str) else ''
+        right_name = ent['k_r'].split('/')[-1] if isinstance(ent['k_r'], str) else ''
+        text = f"LEFT: {left_name}   |   RIGHT: {right_name}"
+        cv2.putText(img, text, (10, 30), cv2.FONT_HERSHEY_SIMPLEX,
+                    1, (0, 255, 0), 2, cv2.LINE_AA)
+
+        # Sauvegarde et affichage
+        name = (f"{red}.png" if JOIN_BY_FRAME_ID else f"{red:.3f}.png").replace('/', '_')
+        os.makedirs('save', exist_ok=True)
+        cv2.imwrite(os.path.join('save', name), img)
+        GLib.idle_add(lambda: (cv2.imshow('Sync', img), cv2.waitKey(1)))
+
 
 
     # def _process_samples(self):
@@ -355,7 +597,10 @@ class SRTSyncClient:
             print("[RUN] Interrupted by user")
         finally:
             self.pipeline.set_state(Gst.State.NULL)
-            print("[RUN] Pipeline stopped")
+            print(f"[RUN] Pipeline stopped, evicted={self.evicted} late={self.late}")
+            if STAMP_CHECK:
+                self.stamp_latency.report()
+                print("[STAMP] " + " ".join(f"{k}={v}" for k, v in sorted(self.stamp_counts.items())))
 
 if __name__ == '__main__':
     app = SRTSyncClient()
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+import os
+import threading
+import queue
+import gi
+import numpy as np
+import cv2
+import info_pb2
+from ts_transport import JPEG_KEY, KLV_KEY, KlvReassembler, pid_map, pad_pid, format_streamid
+
+gi.require_version('Gst', '1.0')
+from gi.repository import Gst, GLib
+
+# --- Configuration ---
+# Client of generator_slam.py with TRANSPORT = "ts": video and KLV of every
+# camera come in one MPEG-TS, so matching samples carry identical PTS.
+TS_SRT_URI  = "srt://127.0.0.1:6030?mode=caller"
+CAMERAS     = ['left', 'right']   # same order as CAMERAS in the generator
+STREAMS     = None                # cameras to request by SRT streamid (None = all)
+MAX_PENDING = 32                  # incomplete PTS groups kept before eviction
+SAVE_DIR    = None                # e.g. 'save' to write every synced frame
+
+Gst.init(None)
+
+
+class TSSyncClient:
+    def __init__(self):
+        print("[INIT] Initializing TSSyncClient")
+        self.loop = GLib.MainLoop()
+        self.sample_queue = queue.Queue()
+        self.cameras = STREAMS or CAMERAS
+        self.pids = {pid: v for pid, v in pid_map(CAMERAS).items() if v[0] in self.cameras}
+        self.reassemblers = {pid: KlvReassembler(JPEG_KEY if kind == 'frame' else KLV_KEY)
+                             for pid, (_, kind) in self.pids.items()}
+        self.pending = {}
+        self.group_size = 2 * len(self.cameras)
+        self.synced = 0
+        self.evicted = 0
+        self.running = True
+
+        threading.Thread(target=self._process_samples, daemon=True).start()
+        self._build_pipeline()
+
+    def _build_pipeline(self):
+        desc = f"srtsrc name=srt latency=1000 uri={TS_SRT_URI} ! queue ! tsdemux name=dmx"
+        print("[PIPELINE] Launching pipeline:\n", desc)
+        pipe = Gst.parse_launch(desc)
+        streamid = format_streamid(self.cameras)
+        pipe.get_by_name('srt').set_property('streamid', streamid)
+        print(f"[PIPELINE] requesting {streamid}")
+        pipe.get_by_name('dmx').connect('pad-added', self._on_pad_added)
+        bus = pipe.get_bus()
+        bus.add_signal_watch()
+        bus.connect('message', self._on_message)
+        self.pipeline = pipe
+        pipe.set_state(Gst.State.PLAYING)
+        print("[PIPELINE] State set to PLAYING")
+
+    def _on_pad_added(self, demux, pad):
+        try:
+            pid = pad_pid(pad.get_name())
+        except ValueError:
+            pid = None
+        if pid not in self.pids:
+            # not requested: drained so tsdemux never sees not-linked
+            branch = Gst.parse_bin_from_description("fakesink sync=false", True)
+            self.pipeline.add(branch)
+            pad.link(branch.get_static_pad('sink'))
+            branch.sync_state_with_parent()
+            print(f"[PIPELINE] ignoring demux pad {pad.get_name()}")
+            return
+        cam, kind = self.pids[pid]
+        branch = Gst.parse_bin_from_description(
+            "queue ! appsink name=sink emit-signals=true sync=false drop=false", True)
+        self.pipeline.add(branch)
+        pad.link(branch.get_static_pad('sink'))
+        branch.get_by_name('sink').connect('new-sample', self._on_sample, pid)
+        branch.sync_state_with_parent()
+        print(f"[PIPELINE] {pad.get_name()} -> {cam}/{kind}")
+
+    def _on_sample(self, sink, pid):
+        sample = sink.emit('pull-sample')
+        buf = sample.get_buffer()
+        ok, info = buf.map(Gst.MapFlags.READ)
+        if not ok:
+            return Gst.FlowReturn.OK
+        data = bytes(info.data)
+        buf.unmap(info)
+        pts = buf.pts if buf.pts != Gst.CLOCK_TIME_NONE else None
+        cam, kind = self.pids[pid]
+        for pts, payload in self.reassemblers[pid].feed(data, pts):
+            if pts is not None:
+                self.sample_queue.put((pts, cam, kind, payload))
+        return Gst.FlowReturn.OK
+
+    def _decode(self, kind, payload):
+        if kind == 'frame':
+            return cv2.imdecode(np.frombuffer(payload, np.uint8), cv2.IMREAD_COLOR)
+        msg = info_pb2.StreamInfo()
+        try:
+            msg.ParseFromString(payload)
+        except Exception:
+            return None
+        return msg.filename
+
+    def _process_samples(self):
+        print("[PROCESS] Sample processing thread started")
+        while self.running:
+            try:
+                pts, cam, kind, payload = self.sample_queue.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            group = self.pending.setdefault(pts, {})
+            group[(cam, kind)] = self._decode(kind, payload)
+            if len(group) == self.group_size:
+                del self.pending[pts]
+                self._emit(pts, group)
+            elif len(self.pending) > MAX_PENDING:
+                oldest = min(self.pending)
+                print(f"[EVICT] pts={oldest / Gst.SECOND:.3f}s incomplete: {sorted(self.pending[oldest])}")
+                del self.pending[oldest]
+                self.evicted += 1
+
+    def _emit(self, pts, group):
+        self.synced += 1
+        names = [os.path.basename(group[(cam, 'klv')] or '') for cam in self.cameras]
+        print(f"[SYNC] pts={pts / Gst.SECOND:.3f}s " + " ".join(f"{c}={n}" for c, n in zip(self.cameras, names)))
+        frames = [group[(cam, 'frame')] for cam in self.cameras]
+        if any(f is None for f in frames):
+            return
+        img = np.hstack(frames)
+        cv2.putText(img, " | ".join(names), (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2, cv2.LINE_AA)
+        if SAVE_DIR:
+            os.makedirs(SAVE_DIR, exist_ok=True)
+            cv2.imwrite(os.path.join(SAVE_DIR, f"{pts / Gst.SECOND:.3f}.png"), img)
+        GLib.idle_add(lambda i=img: (cv2.imshow('Sync', i), cv2.waitKey(1)) and False)
+
+    def _on_message(self, bus, msg):
+        if msg.type == Gst.MessageType.ERROR:
+            err, dbg = msg.parse_error()
+            print("[ERROR]", err.message)
+            self.running = False
+            self.loop.quit()
+        elif msg.type == Gst.MessageType.EOS:
+            print("[EOS] End of stream")
+            self.running = False
+            self.loop.quit()
+
+    def run(self):
+        print("[RUN] Starting main loop")
+        try:
+            self.loop.run()
+        except KeyboardInterrupt:
+            print("[RUN] Interrupted by user")
+        finally:
+            self.pipeline.set_state(Gst.State.NULL)
+            print(f"[RUN] Pipeline stopped, synced={self.synced} evicted={self.evicted}")
+
+
+if __name__ == '__main__':
+    TSSyncClient().run()
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Generator telemetry as JSON lines, one record per interval:
+
+    {"t": 12.0, "wall": 1718000000.1,
+     "appsrc": {"vid_left": {"level_bytes": 0, "level_buffers": 0,
+                             "calls_per_s": 4.0, "cb_avg_us": 850.2, "cb_busy": 0.0034}, ...},
+     "sinks": {"vid_left_srt": {"bytes_per_s": 412345.0, "bytes": 4123450}, ...}}
+
+calls_per_s / cb_avg_us / cb_busy (fraction of wall time) cover the
+callbacks wrapped with timed() (need-data handlers), keyed by the appsrc
+they feed. Sink bytes come from tcpserversink 'bytes-served' and the
+srtserversink stats; only other sinks get a pad probe. Everything else is
+read from element properties once per interval, so the cost does not
+depend on the frame rate.
+"""
+import json
+import sys
+import threading
+import time
+
+from gi.repository import Gst, GLib
+
+from fanout import srt_sink_stats
+
+SINK_FACTORIES = ('srtserversink', 'srtsink', 'tcpserversink', 'fakesink', 'filesink', 'udpsink')
+
+
+class Telemetry:
+    def __init__(self, path="-", interval=1.0):
+        self.out = sys.stdout if path in (None, "-") else open(path, 'a', buffering=1)
+        self.interval = interval
+        self.appsrcs = {}
+        self.sinks = {}
+        self.calls = {}      # name -> [calls, seconds inside]
+        self._probe_bytes = {}
+        self._prev = {}
+        self._lock = threading.Lock()
+        self._t0 = self._last = time.monotonic()
+
+    def timed(self, name, callback):
+        """Wraps a need-data style callback to count its calls and time spent in it."""
+        stat = self.calls.setdefault(name, [0, 0.0])
+
+        def wrapped(*args):
+            t = time.perf_counter()
+            try:
+                return callback(*args)
+            finally:
+                dt = time.perf_counter() - t
+                with self._lock:
+                    stat[0] += 1
+                    stat[1] += dt
+        return wrapped
+
+    def watch_pipeline(self, pipeline):
+        """Registers every appsrc and network/fake sink of the pipeline."""
+        for elem in pipeline.iterate_recurse():
+            factory = elem.get_factory()
+            kind = factory.get_name() if factory else ""
+            if kind == 'appsrc':
+                self.appsrcs[elem.get_name()] = elem
+            elif kind in SINK_FACTORIES:
+                self.watch_sink(elem)
+
+    def watch_sink(self, sink):
+        name = sink.get_name()
+        self.sinks[name] = sink
+        kind = sink.get_factory().get_name()
+        if kind not in ('tcpserversink', 'srtserversink', 'srtsink'):
+            self._probe_bytes[name] = 0
+            sink.get_static_pad('sink').add_probe(Gst.PadProbeType.BUFFER, self._on_buffer, name)
+
+    def _on_buffer(self, pad, info, name):
+        self._probe_bytes[name] += info.get_buffer().get_size()
+        return Gst.PadProbeReturn.OK
+
+    def _sink_bytes(self, name, sink):
+        if name in self._probe_bytes:
+            return self._probe_bytes[name]
+        if sink.find_property('bytes-served') is not None:
+            return sink.get_property('bytes-served')
+        return srt_sink_stats(sink).get('bytes-sent', 0)
+
+    def sample(self):
+        now = time.monotonic()
+        dt = max(now - self._last, 1e-9)
+        self._last = now
+        record = {'t': round(now - self._t0, 3), 'wall': time.time(), 'appsrc': {}, 'sinks': {}}
+        with self._lock:
+            calls = {name: tuple(stat) for name, stat in self.calls.items()}
+            for stat in self.calls.values():
+                stat[0], stat[1] = 0, 0.0
+        for name in sorted(set(self.appsrcs) | set(calls)):
+            entry = {}
+            src = self.appsrcs.get(name)
+            if src is not None:
+                entry['level_bytes'] = src.get_property('current-level-bytes')
+                if src.find_property('current-level-buffers') is not None:
+                    entry['level_buffers'] = src.get_property('current-level-buffers')
+            if name in calls:
+                n, busy = calls[name]
+                entry['calls_per_s'] = round(n / dt, 2)
+                entry['cb_avg_us'] = round(1e6 * busy / n, 1) if n else 0.0
+                entry['cb_busy'] = round(busy / dt, 5)
+            record['appsrc'][name] = entry
+        for name, sink in self.sinks.items():
+            total = self._sink_bytes(name, sink)
+            prev = self._prev.get(name, 0)
+            self._prev[name] = total
+            record['sinks'][name] = {'bytes_per_s': round((total - prev) / dt, 1), 'bytes': total}
+        self.out.write(json.dumps(record) + "\n")
+        return record
+
+    def start(self):
+        GLib.timeout_add(int(self.interval * 1000), lambda: self.sample() is not None)
+
+    def close(self):
+        if self.out is not sys.stdout:
+            self.out.close()
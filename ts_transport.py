@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Video + KLV in one MPEG-TS (TRANSPORT = "ts" in generator_slam.py).
+
+mpegtsmux has no MJPEG stream type, so each JPEG frame travels as a private
+metadata PES framed like the StreamInfo KLV: 16-byte key + 4-byte big-endian
+length + JPEG bytes. Every camera gets two PIDs, video then KLV, so the
+client knows which camera and stream a demuxed pad carries.
+
+mpegtsmux drops meta/x-klv units over KLV_UNIT_MAX bytes ("KLV meta unit
+too big, splitting not supported"), so the generator pushes a larger frame
+as consecutive units with the same PTS; only the first one starts with the
+key, and KlvReassembler joins them back.
+
+All cameras share one SRT listener. Clients name the cameras they want in
+the SRT streamid (format_streamid); the generator rejects requests for
+unknown cameras and the client demuxes only the requested PIDs.
+"""
+import hashlib
+import struct
+
+JPEG_KEY = hashlib.md5(b"JPEGFrame").digest()
+KLV_KEY = hashlib.md5(b"StreamInfo").digest()
+HEADER_SIZE = 20
+# G_MAXUINT16 - 3: the largest meta/x-klv buffer gstbasetsmux.c accepts
+KLV_UNIT_MAX = 65532
+
+FIRST_PID = 0x100
+
+
+def stream_pids(index):
+    """(video PID, KLV PID) of the camera at position `index` in CAMERAS."""
+    return FIRST_PID + 2 * index, FIRST_PID + 2 * index + 1
+
+
+def pid_map(camera_names):
+    """PID -> (camera name, 'frame' | 'klv')."""
+    out = {}
+    for i, name in enumerate(camera_names):
+        vid, klv = stream_pids(i)
+        out[vid] = (name, 'frame')
+        out[klv] = (name, 'klv')
+    return out
+
+
+def pad_pid(pad_name):
+    """PID of a tsdemux src pad, e.g. 'private_0_0100' -> 0x100."""
+    return int(pad_name.rsplit('_', 1)[1], 16)
+
+
+def format_streamid(camera_names):
+    """
+    SRT streamid requesting these cameras, in SRT access control syntax
+    ("#!::r=left+right,m=request"; ',' separates keys so names are joined by '+').
+    """
+    return "#!::r=" + "+".join(camera_names) + ",m=request"
+
+
+def parse_streamid(streamid):
+    """Camera names requested by a streamid (access control syntax or plain "left+right")."""
+    resource = streamid or ""
+    if resource.startswith("#!::"):
+        keys = dict(kv.split("=", 1) for kv in resource[4:].split(",") if "=" in kv)
+        resource = keys.get('r', "")
+    return [name for name in resource.split("+") if name]
+
+
+def jpeg_header(length):
+    return JPEG_KEY + struct.pack(">I", length)
+
+
+def unit_spans(size, unit=KLV_UNIT_MAX):
+    """(offset, length) of the KLV units a framed packet of `size` bytes is pushed as."""
+    return [(off, min(unit, size - off)) for off in range(0, size, unit)] or [(0, 0)]
+
+
+class KlvReassembler:
+    """
+    Rebuilds key+length framed packets from demuxed buffers. A frame over
+    KLV_UNIT_MAX arrives as several PES packets, only the first of which
+    starts with the key.
+    """
+
+    def __init__(self, key):
+        self.key = key
+        self._buf = bytearray()
+        self._pts = None
+
+    def feed(self, data, pts):
+        """Returns the list of (pts, payload) completed by this buffer."""
+        out = []
+        if data[:16] == self.key:
+            # start of a packet: an unfinished previous one lost a PES, drop it
+            self._buf = bytearray(data)
+            self._pts = pts
+        elif self._buf:
+            self._buf += data
+        else:
+            return out  # continuation of a packet whose start we missed
+        while len(self._buf) >= HEADER_SIZE:
+            if self._buf[:16] != self.key:
+                self._buf.clear()
+                break
+            need = HEADER_SIZE + struct.unpack_from(">I", self._buf, 16)[0]
+            if len(self._buf) < need:
+                break
+            out.append((self._pts, bytes(self._buf[HEADER_SIZE:need])))
+            del self._buf[:need]
+        return out